@@ -1,26 +1,42 @@
-import asyncio
-import random
 import os
-from playwright.async_api import async_playwright, TimeoutError
-from database import Database
+from urllib.parse import quote_plus
+from storage import open_database
+from browser_pool import get_pool
+from crawler import Crawl, CrawlError
+from extraction import AMAZON_SPEC
 
-async def safe_text(locator):
-    try:
-        if await locator.count() > 0:
-            return (await locator.first.inner_text(timeout=3000)).strip()
-    except TimeoutError:
-        return None
-    return None
+# Average of the random 2-3 s sleep that used to follow navigation
+FIXED_WAIT_SECONDS = 2.5
 
-async def safe_attr(locator, attr):
-    try:
-        if await locator.count() > 0:
-            return await locator.first.get_attribute(attr, timeout=3000)
-    except TimeoutError:
-        return None
+def amazon_search_url(query: str, page_number: int = 1):
+    # Search URL construction
+    url = f"https://www.amazon.com/s?k={quote_plus(query)}"
+    return url if page_number == 1 else f"{url}&page={page_number}"
+
+def amazon_row(item):
+    """Turn an extracted card into a Database row, or None if it is incomplete."""
+    title, price, rating = item["title"], item["price"], item["rating"]
+
+    relative_url = item["href"]
+    full_url = None
+    if relative_url:
+        if relative_url.startswith("http"):
+            full_url = relative_url
+        else:
+            full_url = f"https://www.amazon.com{relative_url}"
+
+    if title and price:
+        return (title, price, rating, "Amazon", full_url)
     return None
 
-async def scrape_amazon_async(query: str):
+async def scrape_amazon_async(query: str, max_results=None, max_pages=None):
+    """
+    Scrape Amazon results for `query` and store the products page by page.
+    Must run on the browser pool's loop (see scrape_amazon / scrape_orchestrator).
+    :param max_results: Unique products to collect (default crawler.DEFAULT_MAX_RESULTS)
+    :param max_pages: Or, number of result pages to read
+    :return: Number of products saved
+    """
     print(f"--- Starting Amazon Scraper for: {query} ---")
 
     
@@ -29,86 +45,30 @@ async def scrape_amazon_async(query: str):
 
     # 2. FIX: Initialize Database with the path
     try:
-        db = Database(CRED_PATH)
+        db = open_database(CRED_PATH)
     except Exception as e:
         print(f"❌ Database Connection Failed: {e}")
-        return
-
-    # Search URL construction
-    search_url = f"https://www.amazon.com/s?k={query.replace(' ', '+')}"
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 900},
-            locale="en-US"
-        )
+        raise
 
-        page = await context.new_page()
+    crawl = Crawl(
+        "Amazon", "amazon", amazon_search_url, AMAZON_SPEC, amazon_row, db,
+        wait_timeout=15000, fixed_wait=FIXED_WAIT_SECONDS
+    )
+    try:
+        await crawl.run(query, max_results=max_results, max_pages=max_pages)
+    except Exception as e:
+        # Reported by the caller (scrape_orchestrator marks the retailer as failed)
+        print(f"Amazon Error: {e}")
+        raise CrawlError(str(e), saved=crawl.saved) from e
 
+    finally:
         try:
-            await page.goto(search_url, timeout=60000)
-            # Add a small random wait to mimic human behavior
-            await page.wait_for_timeout(random.randint(2000, 3000))
-
-            # Locate product cards
-            products = page.locator('div[data-component-type="s-search-result"]')
-            
-            # Fallback if the standard selector fails (sometimes Amazon changes containers)
-            if await products.count() == 0:
-                 products = page.locator('.s-result-item[data-component-type="s-search-result"]')
-
-            count = await products.count()
-            limit = min(count, 10)
-
-            saved = 0
-            for i in range(limit):
-                product = products.nth(i)
-
-                title = await safe_text(product.locator("h2 span"))
-                
-                price = await safe_text(product.locator("span.a-price > span.a-offscreen"))
-                
-                rating = await safe_text(product.locator("span.a-icon-alt"))
-                
-                relative_url = None
-                
-                relative_url = await safe_attr(product.locator("h2 a"), "href")
-                
-                if not relative_url:
-                    relative_url = await safe_attr(product.locator(".s-product-image-container a"), "href")
-
-                if not relative_url:
-                    relative_url = await safe_attr(product.locator("a"), "href")
-
-                full_url = None
-                if relative_url:
-                    if relative_url.startswith("http"):
-                        full_url = relative_url
-                    else:
-                        full_url = f"https://www.amazon.com{relative_url}"
-
-                if title and price:
-                    db.insert((title, price, rating, "Amazon", full_url))
-                    saved += 1
-
-            print(f"Total saved from Amazon: {saved}")
-
-        except Exception as e:
-            print(f"Amazon Error: {e}")
-
-        finally:
-            await browser.close()
-            try:
-                db.close()
-            except:
-                pass
+            db.close()
+        except:
+            pass
 
-def scrape_amazon(query: str):
-    asyncio.run(scrape_amazon_async(query))
+    print(f"Total saved from Amazon: {crawl.saved}")
+    return crawl.saved
 
+def scrape_amazon(query: str, max_results=None, max_pages=None):
+    return get_pool().run(scrape_amazon_async(query, max_results, max_pages))
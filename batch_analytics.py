@@ -0,0 +1,179 @@
+"""
+Catalog-wide price statistics computed in one batch from the snapshot's history.
+
+    python batch_analytics.py    # sync the snapshot, then rebuild the summary
+
+Products are processed CHUNK_SIZE at a time: each chunk's points are filtered out
+of the memory-mapped history table and reduced with pandas groupby, so memory
+grows with the chunk rather than the catalog. Prices are step functions (a point
+is written when the price changes), so averages weight each price by how long it
+held and "the price N days ago" is the one in effect at that moment.
+
+The result, one row per product, is written next to the snapshot as
+summary.arrow and read by the dashboard's price drop leaderboard, which rebuilds
+it on a background thread once it is older than SUMMARY_MAX_AGE.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from storage import CRED_PATH, TIME_FORMAT, open_database
+from snapshot import Snapshot, read_arrow, write_arrow
+from metrics import span
+
+CHUNK_SIZE = 2000            # products per batch
+DROP_WINDOWS = (1, 7, 30)    # days for percent drop columns drop_<N>d
+ROLLING_WINDOWS = (7, 30)    # days for time-weighted average columns avg_<N>d
+SUMMARY_FILE = "summary.arrow"
+SUMMARY_MAX_AGE = 15 * 60    # seconds before the dashboard rebuilds the summary in the background
+
+DAY = pd.Timedelta(days=1)
+
+
+def product_stats(points, now):
+    """
+    Per-product statistics for one chunk of history.
+    :param points: DataFrame with product_id, price_value and timestamp (datetime)
+    :param now: Time the statistics are computed for (the last price holds until then)
+    :return: DataFrame indexed by product_id
+    """
+    # Unparseable prices ("Out of stock") are stored as 0: like price_aggregates, skip them
+    df = points[points["price_value"] > 0].sort_values(["product_id", "timestamp"], kind="stable")
+    df = df.reset_index(drop=True)
+    groups = df.groupby("product_id", sort=False)
+    # Each price holds from its point until the next point (or now)
+    until = groups["timestamp"].shift(-1).fillna(now)
+
+    stats = groups["price_value"].agg(
+        current_price="last", price_min="min", price_max="max", points="size",
+    )
+    stats["vs_min_pct"] = (stats["current_price"] - stats["price_min"]) / stats["price_min"] * 100
+    stats["volatility"] = groups["price_value"].std(ddof=0) / groups["price_value"].mean()
+
+    for days in ROLLING_WINDOWS:
+        start = now - days * DAY
+        held = (until.clip(lower=start) - df["timestamp"].clip(lower=start)).dt.total_seconds()
+        weighted = (df["price_value"] * held).groupby(df["product_id"]).sum()
+        total = held.groupby(df["product_id"]).sum()
+        stats[f"avg_{days}d"] = (weighted / total.replace(0, np.nan)).reindex(stats.index)
+
+    first_price = groups["price_value"].first()
+    for days in DROP_WINDOWS:
+        cutoff = now - days * DAY
+        # Price in effect at the cutoff; products first seen later start from their first price
+        before = df[df["timestamp"] <= cutoff].groupby("product_id")["price_value"].last()
+        then = before.reindex(stats.index).fillna(first_price)
+        stats[f"drop_{days}d"] = (then - stats["current_price"]) / then * 100
+
+    at_min = df["price_value"] == groups["price_value"].transform("min")
+    last_at_min = until[at_min].groupby(df.loc[at_min, "product_id"]).max()
+    stats["days_since_lowest"] = (now - last_at_min).dt.total_seconds() / 86400
+    stats["last_change"] = groups["timestamp"].max().dt.strftime(TIME_FORMAT)
+    return stats
+
+
+def build_summary(snapshot, now=None, chunk_size=CHUNK_SIZE):
+    """Statistics for every product with history in `snapshot`, CHUNK_SIZE products at a time."""
+    now = pd.Timestamp(now or datetime.now())
+    points = snapshot.points
+    product_ids = pc.unique(points["product_id"])
+    frames = []
+    with span("batch_analytics", products=len(product_ids)):
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = points.filter(pc.is_in(points["product_id"], value_set=product_ids.slice(start, chunk_size)))
+            df = chunk.select(["product_id", "price_value", "timestamp"]).to_pandas()
+            df["timestamp"] = pd.to_datetime(df["timestamp"], format=TIME_FORMAT)
+            frames.append(product_stats(df, now))
+
+    summary = pd.concat(frames) if frames else product_stats(
+        pd.DataFrame({
+            "product_id": pd.Series([], dtype=str),
+            "price_value": pd.Series([], dtype=float),
+            "timestamp": pd.to_datetime(pd.Series([], dtype=str)),
+        }),
+        now,
+    )
+    summary = summary.rename_axis("product_id").reset_index()
+    summary["computed_at"] = now.strftime(TIME_FORMAT)
+    return summary
+
+
+def summary_path(snapshot):
+    return os.path.join(snapshot.directory, SUMMARY_FILE)
+
+
+def write_summary(snapshot, summary):
+    table = pa.Table.from_pandas(summary, preserve_index=False)
+    write_arrow(summary_path(snapshot), [table], table.schema)
+
+
+def summary_mtime(snapshot):
+    """Modification time of the stored summary, or None if it was never built."""
+    path = summary_path(snapshot)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def read_summary(snapshot):
+    """The stored summary, or None if it was never built."""
+    if summary_mtime(snapshot) is None:
+        return None
+    return read_arrow(summary_path(snapshot)).to_pandas()
+
+
+_rebuild_lock = threading.Lock()
+_rebuild = None
+
+
+def rebuild_in_background(snapshot, max_age=SUMMARY_MAX_AGE):
+    """
+    Rebuild the summary on a background thread if it is missing or older than
+    `max_age` seconds (one rebuild at a time). Readers keep the previous file meanwhile.
+    :return: True while a rebuild is running
+    """
+    global _rebuild
+    with _rebuild_lock:
+        if _rebuild is not None and _rebuild.is_alive():
+            return True
+        mtime = summary_mtime(snapshot)
+        if mtime is not None and time.time() - mtime <= max_age:
+            return False
+
+        def run():
+            try:
+                write_summary(snapshot, build_summary(snapshot))
+            except Exception as e:
+                print(f"⚠️ Price summary rebuild failed: {e}")
+
+        _rebuild = threading.Thread(target=run, name="price-summary", daemon=True)
+        _rebuild.start()
+        return True
+
+
+def biggest_drops(summary, snapshot, days=7, n=10, min_drop=0.0):
+    """
+    Leaderboard of the largest percent drops over the last `days` (one of DROP_WINDOWS),
+    with each product's title, retailer, url and price from the snapshot.
+    """
+    column = f"drop_{days}d"
+    if summary is None or summary.empty:
+        return pd.DataFrame()
+    drops = summary[summary[column] > min_drop].nlargest(n, column)
+    products = snapshot.products
+    listed = products.filter(pc.is_in(products["id"], value_set=pa.array(drops["product_id"], pa.string())))
+    listed = listed.select(["id", "title", "retailer", "url", "price"]).to_pandas()
+    return drops.merge(listed, left_on="product_id", right_on="id", how="inner").drop(columns="id")
+
+
+if __name__ == "__main__":
+    snapshot = Snapshot()
+    snapshot.sync(open_database(CRED_PATH), force=True)
+    summary = build_summary(snapshot)
+    write_summary(snapshot, summary)
+    print(f"📊 Summarised {len(summary)} products into {summary_path(snapshot)}.")
+    top = biggest_drops(summary, snapshot, days=7, n=5)
+    for row in top.itertuples():
+        print(f"   -{row.drop_7d:.1f}%  {row.title[:60]} ({row.retailer}, now {row.current_price:,.0f})")
@@ -0,0 +1,175 @@
+"""
+Extraction benchmark over recorded fixtures (see fixtures.py): per-page parse
+latency, items/sec and Python-side allocations for each extraction strategy.
+
+    python fixtures.py record "iphone 15" --pages 2   # once, needs network
+    python benchmarks/bench_extraction.py [repeats]
+
+Browser strategies time only the extraction on an already loaded page and are
+skipped when Chromium is not installed.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import FIXTURES_DIR, load_manifest, sources
+from extraction import extract_cards, extract_html
+from daraz_http import parse_listing
+
+
+# --- Previous per-field locator extraction (kept here as the baseline) ---
+
+async def legacy_locators(page, spec):
+    cards = None
+    for selector in spec["cards"]:
+        cards = page.locator(selector)
+        if await cards.count():
+            break
+
+    items = []
+    for i in range(min(await cards.count(), spec["limit"])):
+        card = cards.nth(i)
+        item = {}
+        for name, rules in spec["fields"].items():
+            item[name] = None
+            for rule in rules:
+                if rule.get("own_text"):
+                    locator = card.locator(f"xpath=.//{rule['css']}[contains(text(), '{rule['own_text']}')]")
+                else:
+                    locator = card.locator(rule["css"])
+                if not await locator.count():
+                    continue
+                if rule.get("attr"):
+                    value = await locator.first.get_attribute(rule["attr"])
+                else:
+                    value = (await locator.first.inner_text()).strip()
+                if value:
+                    item[name] = value
+                    break
+            if item[name] is None:
+                item[name] = spec.get("defaults", {}).get(name)
+        items.append(item)
+    return items
+
+
+def load_pages():
+    """[(fixture name, kind, retailer, body)] for every recorded page."""
+    pages = []
+    for name, entry in sorted(load_manifest().items()):
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            pages.append((name, entry["kind"], entry["retailer"], f.read()))
+    return pages
+
+
+def report(strategy, seconds, items, peak_bytes, blocks):
+    """seconds: per-page latencies of one pass; items: items extracted in that pass."""
+    total = sum(seconds)
+    print(
+        f"{strategy:<24} {len(seconds):>5} {statistics.median(seconds) * 1000:>10.2f} "
+        f"{max(seconds) * 1000:>10.2f} {items / total if total else 0:>11,.0f} "
+        f"{peak_bytes / 1024:>10,.0f} {blocks:>9,}"
+    )
+
+
+def bench_sync(strategy, fn, pages, repeats):
+    """Time `fn(body, retailer)` per page (best of `repeats`), then one traced pass for allocations."""
+    if not pages:
+        return
+    best = None
+    items = 0
+    for _ in range(repeats):
+        seconds = []
+        items = 0
+        for _, _, retailer, body in pages:
+            start = time.perf_counter()
+            items += len(fn(body, retailer))
+            seconds.append(time.perf_counter() - start)
+        if best is None or sum(seconds) < sum(best):
+            best = seconds
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _, _, retailer, body in pages:
+        fn(body, retailer)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "filename"))
+
+    report(strategy, best, items, peak, blocks)
+
+
+async def bench_browser(pages, specs, repeats):
+    try:
+        from playwright.async_api import async_playwright
+        playwright = await async_playwright().start()
+        browser = await playwright.chromium.launch(headless=True)
+    except Exception as e:
+        print(f"(browser strategies skipped: {str(e).splitlines()[0]})")
+        return
+
+    try:
+        page = await browser.new_page()
+        # Fixtures are served offline; block anything the snapshots reference
+        await page.route("**/*", lambda route: route.abort())
+        for strategy, fn in (("page.evaluate (1 call)", extract_cards), ("locators (per field)", legacy_locators)):
+            best = None
+            items = 0
+            peak = blocks = 0
+            for attempt in range(repeats):
+                seconds = []
+                items = 0
+                if attempt == 0:
+                    tracemalloc.start()
+                    before = tracemalloc.take_snapshot()
+                for _, _, retailer, body in pages:
+                    await page.set_content(body, wait_until="domcontentloaded")
+                    start = time.perf_counter()
+                    items += len(await fn(page, {**specs[retailer], "limit": 10_000}))
+                    seconds.append(time.perf_counter() - start)
+                if attempt == 0:
+                    _, peak = tracemalloc.get_traced_memory()
+                    after = tracemalloc.take_snapshot()
+                    tracemalloc.stop()
+                    blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "filename"))
+                if best is None or sum(seconds) < sum(best):
+                    best = seconds
+            report(strategy, best, items, peak, blocks)
+    finally:
+        await browser.close()
+        await playwright.stop()
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    pages = load_pages()
+    if not pages:
+        raise SystemExit(f"No fixtures in {FIXTURES_DIR}; run: python fixtures.py record \"<query>\"")
+
+    specs = {retailer: spec for retailer, (_, spec, _) in sources().items()}
+    html_pages = [p for p in pages if p[1] == "html"]
+    json_pages = [p for p in pages if p[1] == "json"]
+
+    print(f"Fixtures: {len(html_pages)} HTML, {len(json_pages)} JSON; best of {repeats}")
+    print(f"{'Strategy':<24} {'Pages':>5} {'Median ms':>10} {'Max ms':>10} {'Items/sec':>11} {'Peak KiB':>10} {'Blocks':>9}")
+
+    bench_sync("bs4 html.parser", lambda body, retailer: extract_html(body, {**specs[retailer], "limit": 10_000}),
+               html_pages, repeats)
+    try:
+        import lxml  # noqa: F401 (optional faster parser)
+        bench_sync("bs4 lxml", lambda body, retailer: extract_html(body, {**specs[retailer], "limit": 10_000}, "lxml"),
+                   html_pages, repeats)
+    except ImportError:
+        pass
+    bench_sync("daraz catalog JSON", lambda body, retailer: parse_listing(body), json_pages, repeats)
+
+    if html_pages:
+        asyncio.run(bench_browser(html_pages, specs, repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import asyncio
+import atexit
+import os
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+import resource_blocker
+import fixtures
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Browser context settings per retailer (same as the scrapers used to set up themselves)
+CONTEXT_PROFILES = {
+    "amazon": {
+        "user_agent": USER_AGENT,
+        "viewport": {"width": 1280, "height": 900},
+        "locale": "en-US",
+    },
+    "daraz": {
+        "user_agent": USER_AGENT,
+        "viewport": {"width": 1280, "height": 800},
+    },
+}
+
+MAX_PAGES = 4          # concurrent pages across all profiles
+MAX_CONTEXT_USES = 25  # pages handed out before a context is recycled
+
+# Lean mode aborts images, fonts, media and ad/analytics requests (LEAN_MODE=0 to disable)
+LEAN_MODE = os.environ.get("LEAN_MODE", "1") != "0"
+
+
+class _PooledContext:
+    """A browser context plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, context):
+        self.context = context
+        self.uses = 0
+        self.in_use = 0
+        self.idle_pages = []
+        self.retired = False
+        self.closed = False
+
+
+class BrowserPool:
+    """
+    Long-lived Playwright browser shared by every scrape in the process.
+
+    Playwright objects are bound to the event loop that created them, while
+    Streamlit reruns start fresh loops. The pool therefore owns a background
+    thread running its own loop; scrapes are submitted to it with `submit`/`run`
+    and take pages with `async with pool.page("amazon") as page:`.
+    """
+
+    def __init__(self, max_pages=MAX_PAGES, max_context_uses=MAX_CONTEXT_USES, headless=True, lean=LEAN_MODE):
+        self.max_pages = max_pages
+        self.max_context_uses = max_context_uses
+        self.headless = headless
+        self.lean = lean
+
+        self._playwright = None
+        self._browser = None
+        self._contexts = {}
+        self._semaphore = None
+        self._launch_lock = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._thread.start()
+
+    # --- Thread bridge ---
+
+    def submit(self, coro):
+        """Schedule a coroutine on the pool's loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the pool's loop and block until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    # --- Browser lifecycle ---
+
+    async def _ensure_browser(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+            self._launch_lock = asyncio.Lock()
+
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            # Browser crashed or never started: drop everything tied to it
+            self._contexts.clear()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=["--disable-blink-features=AutomationControlled"]
+            )
+            print("🧭 Browser pool: launched Chromium.")
+            return self._browser
+
+    async def _get_context(self, profile: str):
+        browser = await self._ensure_browser()
+        pooled = self._contexts.get(profile)
+        if pooled is None or pooled.retired:
+            context = await browser.new_context(**CONTEXT_PROFILES[profile])
+            if fixtures.REPLAY:
+                # Offline: recorded pages only, no requests reach the sites
+                await fixtures.install_replay(context)
+            elif self.lean:
+                await resource_blocker.install(context)
+            pooled = _PooledContext(context)
+            self._contexts[profile] = pooled
+        return pooled
+
+    async def _close_context(self, pooled):
+        if pooled.closed:
+            return
+        pooled.closed = True
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self, profile: str):
+        """
+        Borrow a warm page configured for `profile` (a CONTEXT_PROFILES key).
+        At most `max_pages` pages are out at once; callers wait for a free slot.
+        """
+        await self._ensure_browser()
+        async with self._semaphore:
+            pooled = await self._get_context(profile)
+            page = pooled.idle_pages.pop() if pooled.idle_pages else await pooled.context.new_page()
+            pooled.uses += 1
+            pooled.in_use += 1
+
+            crashed = False
+            try:
+                yield page
+            except Exception:
+                crashed = page.is_closed() or not self._browser.is_connected()
+                raise
+            finally:
+                pooled.in_use -= 1
+                if crashed or pooled.uses >= self.max_context_uses:
+                    pooled.retired = True
+
+                if pooled.retired or page.is_closed():
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+                else:
+                    pooled.idle_pages.append(page)
+
+                # Recycled contexts are closed once their last page comes back
+                if pooled.retired and pooled.in_use == 0:
+                    await self._close_context(pooled)
+
+    async def _close(self):
+        for pooled in self._contexts.values():
+            await self._close_context(pooled)
+        self._contexts.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self):
+        """Shut the browser and the loop thread down."""
+        if not self._loop.is_running():
+            return
+        try:
+            self.run(self._close(), timeout=30)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide browser pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
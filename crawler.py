@@ -0,0 +1,178 @@
+import asyncio
+import math
+import os
+from playwright.async_api import TimeoutError
+from browser_pool import get_pool
+from extraction import extract_cards
+from rate_limiter import get_limiter, check_blocked
+from storage import product_id
+import resource_blocker
+from metrics import span
+
+# Default depth: results per retailer per scrape (SCRAPE_MAX_RESULTS overrides)
+DEFAULT_MAX_RESULTS = int(os.environ.get("SCRAPE_MAX_RESULTS", "10"))
+
+# Hard cap on result pages per query, whatever the requested depth
+MAX_PAGES_LIMIT = 20
+
+
+class CrawlError(Exception):
+    """A crawl that failed part way; `saved` products were stored before it stopped."""
+
+    def __init__(self, message, saved=0):
+        super().__init__(message)
+        self.saved = saved
+
+
+async def fetch_items(page, url, spec, label, wait_timeout=10000, fixed_wait=0.0, retailer=""):
+    """
+    Load one results page and extract every card on it.
+    :param fixed_wait: Seconds the old code slept after navigation (for the savings report)
+    :param retailer: Label for the timing spans
+    """
+    card_selector = ", ".join(spec["cards"])
+    with span("page_load", retailer=retailer), resource_blocker.measure(page, fixed_wait=fixed_wait) as stats:
+        await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+
+        # Wait for the product cards instead of sleeping a fixed time
+        stats.start_wait()
+        try:
+            await page.wait_for_selector(card_selector, timeout=wait_timeout)
+        except TimeoutError:
+            # No cards: either an empty search or a captcha page
+            await check_blocked(page)
+        stats.mark_ready()
+    print(stats.summary(label))
+
+    with span("extraction", retailer=retailer):
+        return await extract_cards(page, spec)
+
+
+class Crawl:
+    """
+    One retailer's crawl of a query across several result pages.
+
+    Pages after the first are fetched concurrently (over HTTP when the retailer
+    has a fast path, otherwise on pooled browser pages). Each page's
+    items are de-duplicated by canonical product id and written to storage as
+    soon as the page is parsed, so only the set of seen ids is kept in memory.
+    """
+
+    def __init__(self, retailer, profile, build_url, spec, to_row, db, fast_fetch=None, **fetch_options):
+        """
+        :param retailer: Retailer name stored with each product (e.g. "Amazon")
+        :param profile: Browser pool profile (e.g. "amazon")
+        :param build_url: Callable (query, page_number) -> results page URL
+        :param spec: Extraction spec (see extraction.py); its limit is ignored
+        :param to_row: Callable item -> (title, price, rating, retailer, url) or None
+        :param db: Storage backend
+        :param fast_fetch: Optional async (query, page_number) -> items without a browser;
+                           the browser is used for a page when it fails or finds nothing
+        """
+        self.retailer = retailer
+        self.fast_fetch = fast_fetch
+        self.profile = profile
+        self.build_url = build_url
+        self.spec = {**spec, "limit": 10_000}
+        self.to_row = to_row
+        self.db = db
+        self.fetch_options = fetch_options
+        # Shared with every other crawl of this retailer in the process
+        self.limiter = get_limiter(retailer)
+
+        self.seen = set()
+        self.saved = 0
+        self.max_results = None
+
+    async def _fast_items(self, query, page_number):
+        """Items from the fast path, or None when the browser has to take over."""
+        if self.fast_fetch is None:
+            return None
+        try:
+            async with self.limiter.slot():
+                with span("http_fetch", retailer=self.retailer):
+                    items = await self.fast_fetch(query, page_number)
+        except Exception as e:
+            # Blocked or broken: stop using the fast path for the rest of this crawl
+            print(f"{self.retailer} fast path failed on page {page_number} ({e}); using browser.")
+            self.fast_fetch = None
+            return None
+        return items or None
+
+    async def _browser_items(self, query, page_number):
+        url = self.build_url(query, page_number)
+        async with get_pool().page(self.profile) as page:
+            return await fetch_items(
+                page, url, self.spec, f"{self.retailer} p{page_number}", retailer=self.retailer, **self.fetch_options
+            )
+
+    async def _crawl_page(self, query, page_number):
+        items = await self._fast_items(query, page_number)
+        if items is None:
+            # Paced and retried with backoff; a block page also cools the retailer down
+            items = await self.limiter.call(
+                lambda: self._browser_items(query, page_number), label=f"{self.retailer} p{page_number}"
+            )
+
+        rows = []
+        for item in items:
+            row = self.to_row(item)
+            if row is None:
+                continue
+            key = product_id(self.retailer, row[4], row[0])
+            if key in self.seen:
+                continue
+            if self.max_results and len(self.seen) >= self.max_results:
+                break
+            self.seen.add(key)
+            rows.append(row)
+
+        # Stream this page to storage right away (blocking client, so off the loop)
+        if rows:
+            self.saved += await asyncio.to_thread(self.db.insert_many, rows)
+        return len(items)
+
+    async def _crawl_pages(self, query, numbers):
+        """Fetch several result pages concurrently; returns the number of cards seen."""
+        outcomes = await asyncio.gather(
+            *[self._crawl_page(query, number) for number in numbers],
+            return_exceptions=True
+        )
+        found = 0
+        for number, outcome in zip(numbers, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"{self.retailer} page {number} Error: {outcome}")
+            else:
+                found += outcome
+        return found
+
+    async def run(self, query, max_results=None, max_pages=None):
+        """
+        Crawl until `max_results` unique products or `max_pages` pages.
+        With neither set, DEFAULT_MAX_RESULTS applies.
+        :return: Number of products saved
+        """
+        if not max_results and not max_pages:
+            max_results = DEFAULT_MAX_RESULTS
+        self.max_results = max_results
+
+        # The first page tells us how many cards a page holds
+        per_page = await self._crawl_page(query, 1)
+        if not per_page:
+            return self.saved
+
+        if max_pages:
+            await self._crawl_pages(query, range(2, min(max_pages, MAX_PAGES_LIMIT) + 1))
+            return self.saved
+
+        # Fetch just enough pages for the remaining results, topping up if
+        # duplicates or incomplete cards left us short
+        next_page = 2
+        while len(self.seen) < max_results and next_page <= MAX_PAGES_LIMIT:
+            wanted = math.ceil((max_results - len(self.seen)) / per_page)
+            numbers = range(next_page, min(next_page + wanted, MAX_PAGES_LIMIT + 1))
+            next_page = numbers.stop
+            if not await self._crawl_pages(query, numbers):
+                break
+
+        return self.saved
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import re
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from browser_pool import USER_AGENT
+from rate_limiter import Blocked, is_block_page
+import fixtures
+
+CATALOG_URL = "https://www.daraz.pk/catalog/"
+
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "application/json, text/html;q=0.9, */*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.daraz.pk/",
+}
+
+_PAGE_DATA = re.compile(r"window\.pageData\s*=\s*")
+
+
+class DarazBlocked(Blocked):
+    """Daraz answered with a captcha/anti-bot page or a blocking status code."""
+
+
+def _make_session():
+    session = requests.Session()
+    # Keep-alive pool sized for concurrent page fetches
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+_session = _make_session()
+
+
+def _to_item(entry):
+    """Map a Daraz listItems entry to the same shape as extraction.DARAZ_SPEC output."""
+    rating = entry.get("ratingScore")
+    has_reviews = str(entry.get("review") or "0") not in ("", "0")
+    return {
+        "title": entry.get("name"),
+        "price": entry.get("priceShow") or (f"Rs. {entry['price']}" if entry.get("price") else None),
+        "rating": rating if rating and has_reviews else None,
+        "href": entry.get("itemUrl") or entry.get("productUrl"),
+    }
+
+
+def parse_listing(text):
+    """
+    Extract result items from a catalog response: the ajax JSON body, or the
+    window.pageData blob embedded in the server-rendered HTML.
+    :raises DarazBlocked: If the body is an anti-bot page
+    """
+    if is_block_page(text):
+        raise DarazBlocked("captcha page")
+
+    data = None
+    stripped = text.lstrip()
+    if stripped.startswith("{"):
+        data = json.loads(stripped)
+    else:
+        soup = BeautifulSoup(text, "html.parser")
+        for script in soup.find_all("script"):
+            body = script.string or ""
+            match = _PAGE_DATA.search(body)
+            if match:
+                # The object literal is followed by more script; decode just the JSON value
+                data, _ = json.JSONDecoder().raw_decode(body, match.end())
+                break
+
+    if not data:
+        return []
+    entries = (data.get("mods") or {}).get("listItems") or []
+    return [_to_item(entry) for entry in entries]
+
+
+def fetch_listing_text(query: str, page_number: int = 1, timeout=15):
+    """Raw catalog response body for one results page (pooled keep-alive connection)."""
+    params = {"ajax": "true", "q": query}
+    if page_number > 1:
+        params["page"] = page_number
+
+    if fixtures.REPLAY:
+        return fixtures.load_listing("Daraz", query, page_number)
+
+    response = _session.get(CATALOG_URL, params=params, timeout=timeout)
+    if response.status_code in (403, 429) or response.status_code >= 500:
+        raise DarazBlocked(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    return response.text
+
+
+def fetch_listing_sync(query: str, page_number: int = 1, timeout=15):
+    """Fetch and parse one results page over plain HTTP."""
+    return parse_listing(fetch_listing_text(query, page_number, timeout))
+
+
+async def fetch_listing(query: str, page_number: int = 1):
+    """Async wrapper: runs the blocking request in a worker thread."""
+    return await asyncio.to_thread(fetch_listing_sync, query, page_number)
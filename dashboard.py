@@ -5,31 +5,137 @@ import streamlit as st
 import os
 import time
 import altair as alt
-from database import Database  
+from storage import open_database
+from normalization import parse_prices, parse_ratings, detect_currencies, value_scores, stored_or_parsed
+from history_cache import get_history_cache
+from matching import ProductMatcher, one_per_cluster, cheapest_offers
+from search_engine import SearchEngine
+from snapshot import Snapshot
+from batch_analytics import read_summary, summary_mtime, rebuild_in_background, biggest_drops, DROP_WINDOWS
+import metrics
+from metrics import span, timed
 
 st.set_page_config(page_title="Scrap & Analytics", layout="wide", page_icon="📊")
 
+# Spans finished during this rerun, for the optional timing panel
+rerun_started = time.perf_counter()
+metrics.start_collecting()
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CRED_PATH = os.path.join(BASE_DIR, "serviceAccountKey.json")
 
-# Initialize Database Class
+# Cached search results expire after this many seconds
+SEARCH_TTL = 300
+
+# Search results shown at first; "Load more" adds another page of this size
+RESULTS_PAGE_SIZE = 100
+
+# Recently updated products loaded into the product matcher at startup
+MATCHER_WARM_LIMIT = 5000
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    """Prometheus endpoint on METRICS_PORT (if set), started once per server."""
+    return metrics.serve_from_env()
+
+get_metrics_server()
+
+@st.cache_resource(show_spinner=False)
+def get_db():
+    """One storage client per server process, shared by all sessions and reruns."""
+    return open_database(CRED_PATH)
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot():
+    """
+    Memory-mapped local copy of products and history, caught up with storage once per server start.
+    Returns (snapshot, None), or (None, error) if that first sync failed.
+    """
+    snapshot = Snapshot()
+    try:
+        snapshot.sync(get_db(), force=True)
+    except Exception as e:
+        # e.g. Firestore without the history.timestamp collection-group index (the message links to it)
+        print(f"⚠️ Snapshot sync failed: {e}")
+        return None, e
+    return snapshot, None
+
+def get_catalog():
+    """Where reads go: the snapshot, or storage itself while the snapshot is unavailable."""
+    snapshot, _ = get_snapshot()
+    return snapshot if snapshot is not None else get_db()
+
+@st.cache_resource(show_spinner=False)
+def get_search_engine():
+    """Ranked in-memory title index shared by all sessions, built from every catalog product."""
+    engine = SearchEngine()
+    engine.refresh(get_catalog(), force=True)
+    return engine
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_price_summary(mtime):
+    """Catalog-wide price statistics as of the summary file's `mtime` (None until first built)."""
+    return read_summary(get_snapshot()[0])
+
+def sync_catalog(force=False):
+    """Pull new writes into the snapshot (at most every SYNC_SECONDS unless forced) and index them."""
+    snapshot, _ = get_snapshot()
+    if snapshot is None:
+        get_search_engine().refresh(db_helper, force=force)
+        return
+    try:
+        changed = snapshot.sync(db_helper, force=force)
+    except Exception as e:
+        print(f"⚠️ Snapshot sync failed: {e}")
+        return
+    if changed:
+        get_search_engine().refresh(snapshot, force=True)
+
+# Initialize Database Class (backend chosen by STORAGE_BACKEND, Firestore by default)
 try:
-    if not os.path.exists(CRED_PATH):
+    if os.environ.get("STORAGE_BACKEND", "firestore").lower() == "firestore" and not os.path.exists(CRED_PATH):
         st.error(f"❌ Missing File: {CRED_PATH}")
         st.stop()
-    db_helper = Database(CRED_PATH)
+    db_helper = get_db()
 except Exception as e:
     st.error(f"❌ Database Connection Error: {e}")
     st.stop()
 
+# Built once per server at startup; later searches only sync newly updated products
+snapshot_error = get_snapshot()[1]
+if snapshot_error is not None:
+    st.error(f"❌ Local snapshot unavailable, reading from the database directly (slower): {snapshot_error}")
+    if st.button("🔁 Retry snapshot sync"):
+        get_snapshot.clear()
+        get_search_engine.clear()
+        st.rerun()
+get_search_engine()
+
 try:
-    from daraz_playwright import scrape_daraz
-    from amazon_playwright import scrape_amazon
+    from job_queue import JobQueue, WorkerPool, WORKERS, query_key
+    from crawler import DEFAULT_MAX_RESULTS
 except ImportError as e:
     st.error(f"❌ Import Error: {e}")
-    st.info("Ensure 'daraz_playwright.py' and 'amazon_playwright.py' are in the same folder and have no syntax errors.")
+    st.info("Ensure 'job_queue.py', 'scrape_orchestrator.py', 'daraz_playwright.py' and 'amazon_playwright.py' are in the same folder and have no syntax errors.")
     st.stop()
 
+# Seconds between job status checks while a scrape runs
+JOB_POLL_SECONDS = 2
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Scrape job queue plus its worker processes, started once per server."""
+    if WORKERS > 0:
+        WorkerPool(WORKERS).start()
+    return JobQueue()
+
+@st.cache_resource(show_spinner=False)
+def get_matcher():
+    """Cross-retailer listing clusters shared by all sessions, seeded with recent products."""
+    matcher = ProductMatcher()
+    matcher.add_many((p["id"], p["title"]) for p in db_helper.latest(limit=MATCHER_WARM_LIMIT, fields=["title"]))
+    return matcher
+
 # Import analytics (Optional - we can keep this soft)
 try:
     from price_analytics import show_price_trend
@@ -70,110 +176,143 @@ st.markdown("""
 
 # HELPER FUNCTIONS ---
 
-import pandas as pd
-import re
-
-def normalize_words(text):
+@timed("search")
+def search_db_smart(query, limit=RESULTS_PAGE_SIZE):
     """
-    Normalize text into comparable keywords:
-    - lowercase
-    - remove special characters
-    - handle singular/plural forms
+    Ranked product search with singular/plural, prefix and typo tolerance.
+    Picks up products stored since the last search, then ranks the in-memory index.
+    Returns the `limit` best matches as a Pandas DataFrame, best first (empty when
+    nothing matches well enough, which offers a live scrape instead).
+    Errors propagate, so load_products never caches a failed search as "no results".
     """
-    text = text.lower()
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    words = text.split()
+    if not query or not query.strip():
+        return pd.DataFrame()
 
-    normalized = set()
-    for word in words:
-        normalized.add(word)
+    sync_catalog()
+    hits = get_search_engine().search(query, k=limit)
 
-        # simple plural handling
-        if word.endswith("s") and len(word) > 3:
-            normalized.add(word[:-1])      # chairs -> chair
-        else:
-            normalized.add(word + "s")     # chair -> chairs
+    if not hits:
+        return pd.DataFrame()
 
-    return normalized
+    df = pd.DataFrame([product for product, _, _ in hits])
+    df["relevance"] = [score for _, score, _ in hits]
+    return df.reset_index(drop=True)
 
 
-def search_db_smart(query):
-    """
-    Smart Firestore search with singular/plural handling.
-    Returns results as a Pandas DataFrame.
-    """
-    try:
-        if not query or not query.strip():
-            return pd.DataFrame()
+@timed("cleaning")
+def prepare_products(df):
+    """Clean and score search results: numeric price/rating, currency, value score."""
+    if df.empty:
+        return df
 
-        query_words = normalize_words(query)
+    df = df.copy()
+    if "url" in df.columns:
+        df["url"] = df["url"].astype(str).apply(lambda x: x if x.lower().startswith("http") else None)
 
-        docs = db_helper.collection.stream()
-        results = []
+    # Numbers parsed at ingest time; older rows fall back to vectorized parsing of the raw strings
+    df["price_numeric"] = stored_or_parsed(df, "price_value", "price", parse_prices)
+    df["rating_numeric"] = stored_or_parsed(df, "rating_value", "rating", parse_ratings)
+    if "currency" not in df.columns and "price" in df.columns:
+        df["currency"] = detect_currencies(df["price"])
 
-        for doc in docs:
-            data = doc.to_dict()
-            data["id"] = doc.id  # preserve Firestore ID
+    clean_df = df[df["price_numeric"] > 1].copy()
+    clean_df["value_score"] = value_scores(clean_df["rating_numeric"], clean_df["price_numeric"])
+    return clean_df
 
-            title = data.get("title", "")
-            if not title:
-                continue
 
-            title_words = normalize_words(title)
+def search_key(query):
+    """Cache key for a query: its normalized keywords, so 'Chairs' and 'chair' share results."""
+    return query_key(query)
 
-            # ALL query keywords must exist in title (singular/plural safe)
-            if query_words.issubset(title_words):
-                results.append(data)
 
-        if not results:
-            return pd.DataFrame()
+@st.cache_resource(show_spinner=False)
+def get_result_versions():
+    """Normalized query -> results version, shared by all sessions; a scrape bumps its query's version."""
+    return {}
 
-        df = pd.DataFrame(results)
 
-        # Sort by latest timestamp
-        if "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-            df = df.sort_values("timestamp", ascending=False)
+@st.cache_data(ttl=SEARCH_TTL, show_spinner=False)
+def load_products(query_key, _query, limit=RESULTS_PAGE_SIZE, version=0):
+    """
+    Search plus cleaning, memoized per normalized query, page count and version until SEARCH_TTL.
+    Returns (cleaned results, hits before cleaning): only the latter shows whether more pages exist.
+    """
+    hits = search_db_smart(_query, limit)
+    return prepare_products(hits), len(hits)
 
-        return df.reset_index(drop=True)
 
+def search_products(query, limit=RESULTS_PAGE_SIZE):
+    """load_products for the UI: a failed search is reported and returns None (and is retried next time)."""
+    key = search_key(query)
+    try:
+        return load_products(key, query, limit, get_result_versions().get(key, 0))
     except Exception as e:
         print("Search Error:", e)
-        return pd.DataFrame()
-
-
-def clean_price(price_input):
-    """Converts price to float."""
-    if isinstance(price_input, (int, float)): return float(price_input)
-    if not isinstance(price_input, str): return 0.0
-    
-    clean_str = price_input.replace(",", "").replace("Rs.", "").replace("PKR", "").replace("$", "").strip()
-    import re
-    match = re.search(r"(\d+(\.\d+)?)", clean_str)
-    return float(match.group(1)) if match else 0.0
+        st.error(f"❌ Search failed: {e}")
+        return None
+
+
+def run_scrape(query):
+    """Queue a background scrape (or join the one already running for this query)."""
+    st.session_state.scrape_job = get_job_queue().submit(query, max_results=st.session_state.scrape_depth)
+    st.session_state.scrape_seen = 0
+
+
+def refresh_results():
+    """Reload the current query past its cached results, which new scraped data makes stale."""
+    # Only this query's entries go stale (every session's); other cached searches are kept
+    versions = get_result_versions()
+    key = search_key(st.session_state.search_term)
+    versions[key] = versions.get(key, 0) + 1
+    sync_catalog(force=True)
+    get_history_cache(get_catalog()).expire()
+    results = search_products(st.session_state.search_term, st.session_state.result_limit)
+    if results is not None:
+        st.session_state.data, st.session_state.hit_count = results
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def scrape_progress():
+    """Poll the running scrape job; reload results whenever a retailer reports back."""
+    job_id = st.session_state.scrape_job
+    jobs = get_job_queue()
+    job = jobs.get(job_id)
+    if job is None:
+        st.session_state.scrape_job = None
+        st.rerun()
+
+    events = jobs.events(job_id)
+    label, state = {
+        "queued": ("⏳ Queued", "running"),
+        "running": ("🚀 Scraping", "running"),
+        "done": ("✅ Scraped", "complete"),
+        "failed": ("❌ Scrape failed", "error"),
+    }[job["status"]]
+    with st.status(f"{label} '{job['query']}'...", expanded=True, state=state):
+        for event in events:
+            st.write(event["message"])
+        if job["error"]:
+            st.error(f"Scrape Error: {job['error']}")
+
+    finished = job["status"] in ("done", "failed")
+    if len(events) > st.session_state.scrape_seen or finished:
+        # Pages are saved as they are crawled, so every report brings new rows
+        st.session_state.scrape_seen = len(events)
+        refresh_results()
+        if finished:
+            st.session_state.scrape_job = None
+        st.rerun()
 
-def clean_rating(rating_input):
-    """Converts rating to float 0-5."""
-    try:
-        if pd.isna(rating_input) or str(rating_input) == "None": return 0.0
-        import re
-        match = re.search(r"(\d+(\.\d+)?)", str(rating_input))
-        if match:
-            val = float(match.group(1))
-            return val if 0 <= val <= 5 else 0.0
-    except: pass
-    return 0.0
-
-def calculate_value_score(rating, price):
-    """Calculate value score (rating per price unit)."""
-    if price > 0:
-        return (rating * 10) / price  # Scale rating by 10 for better visibility
-    return 0
 
 # SESSION STATE INIT ---
 if 'data' not in st.session_state: st.session_state.data = pd.DataFrame()
 if 'search_term' not in st.session_state: st.session_state.search_term = ""
 if 'show_scrape_button' not in st.session_state: st.session_state.show_scrape_button = False
+if 'scrape_depth' not in st.session_state: st.session_state.scrape_depth = DEFAULT_MAX_RESULTS
+if 'scrape_job' not in st.session_state: st.session_state.scrape_job = None
+if 'scrape_seen' not in st.session_state: st.session_state.scrape_seen = 0
+if 'result_limit' not in st.session_state: st.session_state.result_limit = RESULTS_PAGE_SIZE
+if 'hit_count' not in st.session_state: st.session_state.hit_count = 0
 
 #  UI LAYOUT
 st.markdown("<h1 style='text-align: center;'>📊 Scrap and Analyse</h1>", unsafe_allow_html=True)
@@ -191,11 +330,17 @@ with col_search:
 # Search Logic
 if submit_button and new_query:
     st.session_state.search_term = new_query
+    st.session_state.result_limit = RESULTS_PAGE_SIZE
 
     with st.spinner("🔎 Searching products"):
-        df_results = search_db_smart(new_query)
+        results = search_products(new_query)
+    df_results, st.session_state.hit_count = results if results is not None else (None, 0)
 
-    if not df_results.empty:
+    if df_results is None:
+        # Search failed (error shown above): neither results nor a "no matches" scrape offer
+        st.session_state.data = pd.DataFrame()
+        st.session_state.show_scrape_button = False
+    elif not df_results.empty:
         st.session_state.data = df_results
         st.session_state.show_scrape_button = False
     else:
@@ -208,42 +353,46 @@ if st.session_state.show_scrape_button:
     col_msg_l, col_msg_main, col_msg_r = st.columns([1, 4, 1])
     with col_msg_main:
         st.info(f"No exact matches found for '{st.session_state.search_term}'.")
+        st.number_input("Results per store", min_value=5, max_value=200, step=5, key="scrape_depth")
         
         if st.button("🕷️ Scrape Live Data", use_container_width=True):
-            with st.status(f"🚀 Scraping '{st.session_state.search_term}'...", expanded=True):
-                
-                st.write("🔄 Scanning Amazon...")
-                try: 
-                    scrape_amazon(st.session_state.search_term)
-                    st.write("✅ Amazon Done.")
-                except Exception as e: 
-                    st.error(f"Amazon Error: {e}")
-                
-                st.write("🔄 Scanning Daraz...")
-                try: 
-                    scrape_daraz(st.session_state.search_term)
-                    st.write("✅ Daraz Done.")
-                except Exception as e: 
-                    st.error(f"Daraz Error: {e}")
-            
-            # Refresh Data
-            df_new = search_db_smart(st.session_state.search_term)
-            st.session_state.data = df_new
+            # Runs in a worker process; progress and results stream in below
+            run_scrape(st.session_state.search_term)
             st.session_state.show_scrape_button = False
             st.rerun()
 
+# Background scrape progress
+if st.session_state.scrape_job is not None:
+    col_job_l, col_job_main, col_job_r = st.columns([1, 4, 1])
+    with col_job_main:
+        scrape_progress()
+
+# Only the best matches are loaded; more pages on demand. A full page of hits means
+# there may be more, even if cleaning dropped some of them (e.g. unparseable prices)
+if st.session_state.hit_count >= st.session_state.result_limit:
+    col_more_l, col_more_main, col_more_r = st.columns([1, 4, 1])
+    with col_more_main:
+        st.caption(f"Showing the {st.session_state.result_limit} best matches.")
+        if st.button("⬇️ Load more results", use_container_width=True):
+            results = search_products(st.session_state.search_term, st.session_state.result_limit + RESULTS_PAGE_SIZE)
+            if results is not None:
+                st.session_state.result_limit += RESULTS_PAGE_SIZE
+                st.session_state.data, st.session_state.hit_count = results
+                st.rerun()
+
 # --- 6. DATA PROCESSING & VISUALIZATION ---
 df = st.session_state.data
 
 if not df.empty:
-    # Clean Data
-    if "url" in df.columns:
-        df["url"] = df["url"].astype(str).apply(lambda x: x if x.lower().startswith("http") else None)
+    # Already cleaned and scored by load_products; reruns only re-apply the filters
+    clean_df = df
 
-    df["price_numeric"] = df["price"].apply(clean_price) if "price" in df.columns else 0.0
-    df["rating_numeric"] = df["rating"].apply(clean_rating) if "rating" in df.columns else 0.0
-    
-    clean_df = df[df["price_numeric"] > 1].copy()
+    # Link listings of the same product across stores; unseen listings join clusters incrementally
+    if "id" in clean_df.columns:
+        with span("matching"):
+            matcher = get_matcher()
+            matcher.add_many(zip(clean_df["id"], clean_df["title"]))
+            clean_df = clean_df.assign(cluster_id=matcher.cluster_ids(clean_df["id"]))
 
     # Sidebar Filters
     with st.sidebar:
@@ -262,15 +411,10 @@ if not df.empty:
         min_rating = st.slider("Min Rating", 0.0, 5.0, 0.0, step=0.5)
         
         st.markdown("---")
-        if st.button("🔄 Update Prices", use_container_width=True):
+        st.number_input("Results per store", min_value=5, max_value=200, step=5, key="scrape_depth")
+        if st.button("🔄 Update Prices", use_container_width=True, disabled=st.session_state.scrape_job is not None):
             if st.session_state.search_term:
-                with st.status(f"🚀 Updating...", expanded=True):
-                    try:
-                        scrape_amazon(st.session_state.search_term)
-                        scrape_daraz(st.session_state.search_term)
-                    except Exception as e:
-                        st.error(f"Update Failed: {e}")
-                st.session_state.data = search_db_smart(st.session_state.search_term)
+                run_scrape(st.session_state.search_term)
                 st.rerun()
 
     # Apply Filters
@@ -301,10 +445,12 @@ if not df.empty:
     # Charts
     col_chart1, col_chart2 = st.columns([2, 1])
 
-    with col_chart1:
+    with col_chart1, span("chart_build", chart="best_prices"):
         st.subheader("💰 Best Prices")
         if not filtered_df.empty:
-            top_15 = filtered_df.nsmallest(15, "price_numeric")
+            # One bar per product: the cheapest store's listing when it is sold in several
+            grouped = st.toggle("Group same product across stores", value=True, key="group_matches")
+            top_15 = (one_per_cluster(filtered_df) if grouped else filtered_df).nsmallest(15, "price_numeric")
             bar_chart = alt.Chart(top_15).mark_bar().encode(
                 x=alt.X('title:N', axis=None, sort='y'), 
                 y=alt.Y('price_numeric:Q', title='Price'),
@@ -313,7 +459,7 @@ if not df.empty:
             ).properties(height=300)
             st.altair_chart(bar_chart, use_container_width=True)
 
-    with col_chart2:
+    with col_chart2, span("chart_build", chart="retailer_split"):
         st.subheader("📊 Retailer Split")
         if not filtered_df.empty:
             pie_chart = alt.Chart(filtered_df).mark_arc(innerRadius=60).encode(
@@ -326,36 +472,31 @@ if not df.empty:
     # SCATTER PLOT SECTION (Key Insights removed)
     st.markdown("### 📈 Rating vs Price Analysis")
     if not filtered_df.empty:
-        # Calculate value score for insights
-        filtered_df['value_score'] = filtered_df.apply(
-            lambda row: calculate_value_score(row['rating_numeric'], row['price_numeric']), 
-            axis=1
-        )
-        
-        # Create scatter plot
-        scatter_chart = alt.Chart(filtered_df).mark_circle(size=100).encode(
-            x=alt.X('price_numeric:Q', 
-                   title='Price (PKR)',
-                   scale=alt.Scale(zero=False)),
-            y=alt.Y('rating_numeric:Q', 
-                   title='Rating',
-                   scale=alt.Scale(domain=[0, 5])),
-            color=alt.Color('retailer:N', 
-                          legend=alt.Legend(title="Retailer")),
-            size=alt.Size('rating_numeric:Q',
-                         legend=None,
-                         scale=alt.Scale(range=[50, 300])),
-            tooltip=['title:N', 'price:N', 'rating:N', 'retailer:N', 'value_score:Q']
-        ).properties(
-            height=400,
-            title='Product Rating vs Price Relationship'
-        ).configure_axis(
-            grid=True
-        ).configure_view(
-            strokeWidth=0
-        )
-        
-        st.altair_chart(scatter_chart, use_container_width=True)
+        with span("chart_build", chart="rating_vs_price"):
+            # Create scatter plot
+            scatter_chart = alt.Chart(filtered_df).mark_circle(size=100).encode(
+                x=alt.X('price_numeric:Q', 
+                       title='Price (PKR)',
+                       scale=alt.Scale(zero=False)),
+                y=alt.Y('rating_numeric:Q', 
+                       title='Rating',
+                       scale=alt.Scale(domain=[0, 5])),
+                color=alt.Color('retailer:N', 
+                              legend=alt.Legend(title="Retailer")),
+                size=alt.Size('rating_numeric:Q',
+                             legend=None,
+                             scale=alt.Scale(range=[50, 300])),
+                tooltip=['title:N', 'price:N', 'rating:N', 'retailer:N', 'value_score:Q']
+            ).properties(
+                height=400,
+                title='Product Rating vs Price Relationship'
+            ).configure_axis(
+                grid=True
+            ).configure_view(
+                strokeWidth=0
+            )
+
+            st.altair_chart(scatter_chart, use_container_width=True)
 
     # Detailed Table
     st.markdown("### 📄 Product Details")
@@ -382,13 +523,80 @@ if not df.empty:
         hide_index=True
     )
 
+    # Cheapest offer per product sold by more than one store
+    offers = cheapest_offers(filtered_df)
+    if not offers.empty:
+        st.markdown("### 🔗 Same Product, Different Stores")
+        st.dataframe(
+            offers[["title", "retailer", "price", "price_pkr", "highest_pkr", "saving_pkr", "stores", "listings", "url"]],
+            column_config={
+                "retailer": "Cheapest At",
+                "price_pkr": st.column_config.NumberColumn("Cheapest (Rs.)", format="%.0f"),
+                "highest_pkr": st.column_config.NumberColumn("Highest (Rs.)", format="%.0f"),
+                "saving_pkr": st.column_config.NumberColumn("You Save (Rs.)", format="%.0f"),
+                "url": st.column_config.LinkColumn("Link"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
     # --- 7. PRICE ANALYTICS IMPORT ---
     if not filtered_df.empty:
-        show_price_trend(filtered_df, db_helper)
+        # History is read from the local snapshot, not per product from storage
+        show_price_trend(filtered_df, get_catalog())
 
 # EMPTY STATE HANDLING 
 else:
     if st.session_state.search_term:
         st.info(f"No products found for '{st.session_state.search_term}'. Try a different search term or scrape new data.")
     else:
-        st.info("🔍 Enter a product name in the search box above to get started.")
\ No newline at end of file
+        st.info("🔍 Enter a product name in the search box above to get started.")
+
+# PRICE DROP LEADERBOARD (whole catalog, from the batch summary) ---
+with st.expander("📉 Biggest Price Drops", expanded=df.empty):
+    drop_days = st.segmented_control(
+        "Over the last", DROP_WINDOWS, default=7, format_func=lambda d: f"{d} day{'s' if d > 1 else ''}",
+        key="drop_days",
+    ) or 7
+    snapshot = get_snapshot()[0]
+    if snapshot is None:
+        building, leaders = False, pd.DataFrame()
+    else:
+        # Built off the render path; a stale summary is shown until the rebuild lands
+        building = rebuild_in_background(snapshot)
+        with span("leaderboard"):
+            leaders = biggest_drops(load_price_summary(summary_mtime(snapshot)), snapshot, days=drop_days)
+    if snapshot is None:
+        st.caption("Needs the local snapshot, which failed to sync (see the error above).")
+    elif leaders.empty and building:
+        st.caption("⏳ Computing price statistics, check back in a moment.")
+    elif leaders.empty:
+        st.caption("No price drops recorded in this period yet.")
+    else:
+        st.dataframe(
+            leaders[["title", "retailer", "price", f"drop_{drop_days}d", "price_min", "vs_min_pct",
+                     "avg_30d", "volatility", "days_since_lowest", "url"]],
+            column_config={
+                f"drop_{drop_days}d": st.column_config.NumberColumn("Drop", format="%.1f%%"),
+                "price_min": st.column_config.NumberColumn("Lowest", format="%.0f"),
+                "vs_min_pct": st.column_config.NumberColumn("Above Lowest", format="%.1f%%"),
+                "avg_30d": st.column_config.NumberColumn("30-Day Avg", format="%.0f"),
+                "volatility": st.column_config.NumberColumn("Volatility", format="%.2f"),
+                "days_since_lowest": st.column_config.NumberColumn("Days Since Lowest", format="%.1f"),
+                "url": st.column_config.LinkColumn("Link"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+# TIMING PANEL (per rerun, optional)
+rerun_spans = metrics.stop_collecting()
+metrics.record("dashboard.rerun", time.perf_counter() - rerun_started)
+with st.sidebar:
+    st.markdown("---")
+    if st.toggle("⏱️ Show timings", key="show_timings"):
+        st.caption(f"This rerun: {(time.perf_counter() - rerun_started) * 1000:,.0f} ms")
+        if rerun_spans:
+            st.dataframe(pd.DataFrame(rerun_spans).fillna(""), hide_index=True, use_container_width=True)
+        else:
+            st.caption("No instrumented work this rerun (results came from cache).")
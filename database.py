@@ -1,8 +1,27 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 from datetime import datetime
+from search_index import KeywordIndex, chunked, GET_ALL_CHUNK, BATCH_LIMIT
+from storage import (
+    Storage, StateCache, product_id, numeric_fields, price_aggregates, aggregates_from_history, plan_write,
+    AGGREGATE_FIELDS, STATE_FIELDS, PAGE_SIZE, SKIP, RECORD,
+)
+from normalization import parse_price
+from metrics import span, timed
+
+# Each product costs two writes (doc + history point); a transaction holds at most 500
+WRITE_CHUNK = 200
+
+# One per process like the Firebase app itself: scrapers open a client per scrape
+_state = StateCache()
+
+# Read to confirm a cached state before skipping a product; a write by any process changes them
+VERIFY_FIELDS = ["last_updated", "price", "price_value"]
+
+
+class Database(Storage):
+    """Firestore storage backend."""
 
-class Database:
     def __init__(self, cred_path: str):
         """Initialize Firebase Firestore connection."""
         if not firebase_admin._apps:
@@ -11,56 +30,358 @@ class Database:
 
         self.db = firestore.client()
         self.collection = self.db.collection("products")
+        self.index = KeywordIndex(self.db)
+        # Last-known product states: unchanged products cost a projected read and no writes
+        self.state = _state
 
-    def insert(self, data: tuple):
+    @timed("storage.insert_many", backend="firestore")
+    def insert_many(self, rows):
         """
-        Insert or update a product record in Firestore.
-        If the title exists, add a new timestamped price in the 'history' subcollection.
-        :param data: Tuple (title, price, rating, retailer, url)
+        Upsert many products, touching only what changed.
+        Each product lives at a deterministic document id (see product_id). Products
+        whose cached state (see StateCache) shows no change are skipped after a
+        get_all projected to VERIFY_FIELDS confirms no other process wrote them since.
+        The rest are written WRITE_CHUNK at a time, each chunk in a transaction
+        that reads the current docs first, so running aggregates are never computed
+        from a state another process has since replaced. A history point is only
+        appended on a price change or heartbeat (see plan_write).
+        :param rows: Iterable of tuples (title, price, rating, retailer, url)
+        :return: Number of products stored (new, updated or confirmed unchanged)
         """
-        title, price, rating, retailer, url = data
+        # Last row wins if a scrape returns the same product twice
+        products = {}
+        for title, price, rating, retailer, url in rows:
+            products[product_id(retailer, url, title)] = (title, price, rating, retailer, url)
+
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cached = self.state.get_many(products)
+        # Worker processes and the scheduler write too: a cached state is only trusted
+        # while the stored doc still matches it, otherwise the transaction re-reads it
+        for chunk in chunked(list(cached), GET_ALL_CHUNK):
+            refs = [self.collection.document(doc_id) for doc_id in chunk]
+            with span("firestore.get_all", collection="products"):
+                snaps = list(self.db.get_all(refs, field_paths=VERIFY_FIELDS))
+            for snap in snaps:
+                stored = snap.to_dict() if snap.exists else None
+                if stored is None or any(stored.get(f) != cached[snap.id].get(f) for f in VERIFY_FIELDS):
+                    del cached[snap.id]
+        pending = []
+        unchanged = 0
+        for doc_id, (title, price, rating, retailer, url) in products.items():
+            previous = cached.get(doc_id)
+            price_value = numeric_fields(price, rating)["price_value"]
+            if previous is not None and plan_write(previous, price, rating, retailer, url, price_value, current_time) == SKIP:
+                self.state.put(doc_id, previous, refreshed=False)
+                unchanged += 1
+            else:
+                pending.append((doc_id, (title, price, rating, retailer, url)))
+
+        inserted = updated = 0
+        for chunk in chunked(pending, WRITE_CHUNK):
+            with span("firestore.commit"):
+                states, new_titles, retitled, skipped = self._write_chunk(self.db.transaction(), dict(chunk))
+            for doc_id, state in states.items():
+                self.state.put(doc_id, state)
+            inserted += len(new_titles)
+            updated += len(chunk) - len(new_titles) - skipped
+            unchanged += skipped
+
+            # Register the title tokens so searches can find the new products
+            if new_titles:
+                self.index.add_many(new_titles)
+            if retitled:
+                self.index.add_many(
+                    {doc_id: new for doc_id, (old, new) in retitled.items()},
+                    previous={doc_id: old for doc_id, (old, new) in retitled.items()},
+                )
+
+        print(f"Inserted {inserted} new, updated {updated} and skipped {unchanged} unchanged products.")
+        return len(products)
+
+    def _write_chunk(self, transaction, products):
+        """
+        Read, plan and write one chunk of products (doc id -> row) in `transaction`.
+        Firestore re-runs it if one of the docs changes before the commit.
+        :return: (doc id -> state written or read, doc id -> title of new products,
+                  doc id -> (old title, new title) of retitled products, unchanged count)
+        """
+
+        @firestore.transactional
+        def write(transaction):
+            refs = [self.collection.document(doc_id) for doc_id in products]
+            with span("firestore.get_all", collection="products"):
+                snaps = self.db.get_all(
+                    refs, field_paths=["title", "timestamp", *STATE_FIELDS, *AGGREGATE_FIELDS], transaction=transaction
+                )
+                existing = {snap.id: snap.to_dict() for snap in snaps if snap.exists}
+            # Stamped per attempt, so the time written stays within WRITE_WINDOW of the commit
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            states = {}
+            new_titles = {}
+            retitled = {}
+            unchanged = 0
+            for doc_ref, (doc_id, (title, price, rating, retailer, url)) in zip(refs, products.items()):
+                numbers = numeric_fields(price, rating)
+                previous = existing.get(doc_id)
+                action = plan_write(previous, price, rating, retailer, url, numbers["price_value"], current_time)
+
+                if action == SKIP:
+                    states[doc_id] = previous
+                    unchanged += 1
+                    continue
+
+                fields = {
+                    "price": price,
+                    "rating": rating,
+                    "retailer": retailer,
+                    "url": url,
+                    **numbers,
+                    "last_updated": current_time
+                }
+                if action == RECORD:
+                    fields.update(price_aggregates(
+                        self._with_aggregates(doc_id, previous) if previous else None,
+                        numbers["price_value"], current_time
+                    ))
+                    fields["last_recorded"] = current_time
+                    # Add price history in subcollection
+                    transaction.set(doc_ref.collection("history").document(), {
+                        "price": price,
+                        "price_value": numbers["price_value"],
+                        "timestamp": current_time
+                    })
+
+                if previous is not None:
+                    if previous.get("title") and previous["title"] != title:
+                        fields["title"] = title
+                        retitled[doc_id] = (previous["title"], title)
+                    # Update main product info (latest price, rating, etc.)
+                    transaction.update(doc_ref, fields)
+                    states[doc_id] = {**previous, **fields}
+                else:
+                    fields.update({"title": title, "timestamp": current_time})
+                    transaction.set(doc_ref, fields)
+                    states[doc_id] = fields
+                    new_titles[doc_id] = title
+            return states, new_titles, retitled, unchanged
+
+        return write(transaction)
+
+    def _with_aggregates(self, doc_id, data):
+        """Product data with aggregates, rebuilt from history for docs written before they existed."""
+        if data.get("price_count") is not None:
+            return data
+        return {**data, **(aggregates_from_history(self.history(doc_id)) or {})}
+
+    @timed("storage.search", backend="firestore")
+    def search(self, query: str):
+        """
+        Find products whose title contains all query keywords.
+        Uses the keyword index, then fetches only the matching documents.
+        :return: List of product dicts, each with its Firestore 'id'
+        """
+        ids = self.index.lookup(query)
+        results = []
+        for chunk in chunked(ids, GET_ALL_CHUNK):
+            refs = [self.collection.document(doc_id) for doc_id in chunk]
+            results.extend(self._get_all(refs))
+        return results
+
+    def _get_all(self, refs, field_paths=None):
+        with span("firestore.get_all", collection="products"):
+            return self._to_dicts(self.db.get_all(refs, field_paths=field_paths))
+
+    def _stream(self, query, collection="products"):
+        with span("firestore.query", collection=collection):
+            return list(query.stream())
+
+    def _to_dicts(self, snaps):
+        results = []
+        for snap in snaps:
+            if not snap.exists:
+                continue
+            data = snap.to_dict()
+            data["id"] = snap.id
+            results.append(data)
+        return results
+
+    @timed("storage.latest", backend="firestore")
+    def latest(self, product_ids=None, retailer=None, limit=None, since=None, fields=None, start_after=None):
+        """Current state of products, most recently updated first (ties by id, descending)."""
+        # Projections keep the fields that filtering and paging rely on
+        projection = list(dict.fromkeys([*fields, "last_updated", "retailer"])) if fields else None
+
+        if product_ids is not None:
+            results = []
+            for chunk in chunked(product_ids, GET_ALL_CHUNK):
+                refs = [self.collection.document(doc_id) for doc_id in chunk]
+                results.extend(self._get_all(refs, field_paths=projection))
+            if retailer:
+                results = [r for r in results if r.get("retailer") == retailer]
+            if since:
+                results = [r for r in results if (r.get("last_updated") or "") > since]
+            order = lambda r: (r.get("last_updated") or "", r["id"])
+            if start_after:
+                results = [r for r in results if order(r) < order(start_after)]
+            results.sort(key=order, reverse=True)
+            return results[:limit] if limit else results
+
+        query = self.collection
+        if projection:
+            query = query.select(projection)
+        if retailer:
+            query = query.where("retailer", "==", retailer)
+        if since:
+            query = query.where("last_updated", ">", since)
+        query = query.order_by("last_updated", direction=firestore.Query.DESCENDING)
+        query = query.order_by("__name__", direction=firestore.Query.DESCENDING)
+        if start_after:
+            query = query.start_after({"last_updated": start_after["last_updated"], "__name__": start_after["id"]})
+        if limit:
+            query = query.limit(limit)
+        return self._to_dicts(self._stream(query))
+
+    @timed("storage.history", backend="firestore")
+    def history(self, product_id: str, start=None, end=None, after=None):
+        """Price history of one product from its 'history' subcollection, oldest first."""
+        query = self.collection.document(product_id).collection("history")
+        if after:
+            query = query.where("timestamp", ">", after)
+        if start:
+            query = query.where("timestamp", ">=", start)
+        if end:
+            query = query.where("timestamp", "<=", end)
+
+        points = [doc.to_dict() for doc in self._stream(query, "history")]
+        points = [h for h in points if "timestamp" in h and "price" in h]
+        points.sort(key=lambda h: h["timestamp"])
+        return points
+
+    def history_pages(self, since=None, page_size=PAGE_SIZE):
+        """
+        History points of all products through one collection group query, oldest first.
+        Needs a collection group index on history.timestamp (Firestore links to it on first use).
+        """
+        query = self.db.collection_group("history").select(["price", "price_value", "timestamp"])
+        if since:
+            query = query.where("timestamp", ">", since)
+        query = query.order_by("timestamp")
+        cursor = None
+        while True:
+            snaps = self._stream((query.start_after(cursor) if cursor else query).limit(page_size), "history")
+            page = [{"product_id": snap.reference.parent.parent.id, **snap.to_dict()} for snap in snaps]
+            if page:
+                yield page
+            if len(snaps) < page_size:
+                return
+            cursor = snaps[-1]
+
+    def backfill_numeric_fields(self):
+        """Add parsed numeric fields to products and history docs that lack them."""
+        products_updated = history_updated = 0
+        batch = self.db.batch()
+        pending = 0
+
+        def queue(ref, fields):
+            nonlocal batch, pending
+            batch.update(ref, fields)
+            pending += 1
+            if pending >= BATCH_LIMIT:
+                batch.commit()
+                batch = self.db.batch()
+                pending = 0
+
+        for doc in self.collection.select(["price", "rating", "price_value", "price_count"]).stream():
+            data = doc.to_dict() or {}
+
+            points = []
+            for point in doc.reference.collection("history").select(["price", "price_value", "timestamp"]).stream():
+                h = point.to_dict() or {}
+                if "price_value" not in h:
+                    h["price_value"] = parse_price(h.get("price"))
+                    queue(point.reference, {"price_value": h["price_value"]})
+                    history_updated += 1
+                if "timestamp" in h:
+                    points.append(h)
+
+            fields = {}
+            if "price_value" not in data:
+                fields.update(numeric_fields(data.get("price"), data.get("rating")))
+            if data.get("price_count") is None:
+                points.sort(key=lambda h: h["timestamp"])
+                fields.update(aggregates_from_history(points) or {})
+            if fields:
+                queue(doc.reference, fields)
+                products_updated += 1
+
+        if pending:
+            batch.commit()
+        return products_updated, history_updated
+
+    def rekey_products(self):
+        """
+        Move products saved under auto-generated ids (before insert_many) to their
+        product_id. History points keep their document ids, so an interrupted run
+        can be repeated without duplicating them; the old doc is deleted last.
+        """
+        # Collected first so the long-running stream isn't open while docs are deleted
+        moves = []
+        for doc in self.collection.select(["retailer", "url", "title"]).stream():
+            data = doc.to_dict() or {}
+            new_id = product_id(data.get("retailer"), data.get("url"), data.get("title"))
+            if new_id != doc.id:
+                moves.append((doc.id, new_id))
+
+        moved = merged = 0
+        for old_id, new_id in moves:
+            doc = self.collection.document(old_id).get()
+            if not doc.exists:
+                continue
+            data = doc.to_dict() or {}
+            target = self.collection.document(new_id)
+            current = target.get()
+            points = {p.id: p.to_dict() for p in doc.reference.collection("history").stream()}
+            if current.exists:
+                # The same product was re-scraped under its new id: the newer state wins,
+                # first_seen/timestamp go back to the older doc, history is combined
+                existing = current.to_dict()
+                newer, older = (existing, data) if (existing.get("last_updated") or "") >= (data.get("last_updated") or "") else (data, existing)
+                fields = {**older, **newer}
+                for field in ("timestamp", "first_seen"):
+                    known = [d[field] for d in (data, existing) if d.get(field)]
+                    if known:
+                        fields[field] = min(known)
+                combined = list(points.values()) + [p.to_dict() for p in target.collection("history").stream()]
+                fields.update(aggregates_from_history(sorted(combined, key=lambda p: p.get("timestamp") or "")) or {})
+                merged += 1
+            else:
+                fields = data
+
+            batch = self.db.batch()
+            pending = 0
+            for point_id, point in points.items():
+                batch.set(target.collection("history").document(point_id), point)
+                pending += 1
+                if pending >= BATCH_LIMIT:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+            batch.set(target, fields)
+            batch.commit()
+
+            if not current.exists:
+                self.index.add(new_id, fields.get("title"))
+            self.index.remove(doc.id, data.get("title"))
 
-        # Check if product with the same title already exists
-        docs = self.collection.where("title", "==", title).stream()
-        existing_doc = None
-        for doc in docs:
-            existing_doc = doc
-            break
-
-        if existing_doc:
-            doc_ref = self.collection.document(existing_doc.id)
-            # Update main product info (latest price, rating, etc.)
-            doc_ref.update({
-                "price": price,
-                "rating": rating,
-                "retailer": retailer,
-                "url": url,
-                "last_updated": current_time
-            })
-            # Add price history in subcollection
-            doc_ref.collection("history").add({
-                "price": price,
-                "timestamp": current_time
-            })
-            print(f"Updated product '{title}' with new price and timestamp.")
-        else:
-            # Create new product document
-            doc_ref = self.collection.add({
-                "title": title,
-                "price": price,
-                "rating": rating,
-                "retailer": retailer,
-                "url": url,
-                "timestamp": current_time,
-                "last_updated": current_time
-            })[1]  # Firestore returns (update_time, document_reference)
-            # Initialize history subcollection
-            doc_ref.collection("history").add({
-                "price": price,
-                "timestamp": current_time
-            })
-            print(f"Inserted new product '{title}'.")
+            for chunk in chunked(list(points), BATCH_LIMIT - 1):
+                batch = self.db.batch()
+                for point_id in chunk:
+                    batch.delete(doc.reference.collection("history").document(point_id))
+                batch.commit()
+            doc.reference.delete()
+            moved += 1
+        return moved, merged
 
     def close(self):
         """Firestore does not require closing."""
@@ -0,0 +1,139 @@
+"""
+Single-roundtrip DOM extraction driven by declarative selector specs.
+
+A spec describes where each retailer keeps its result cards and fields:
+
+    {
+        "cards": [css, fallback css, ...],   # first selector that matches wins
+        "limit": 10,                         # max cards to read
+        "fields": {
+            name: [rule, fallback rule, ...] # first rule that yields a value wins
+        },
+        "defaults": {name: value},           # used when no rule matches (optional)
+    }
+
+A rule is {"css": selector} for the element's text, plus "attr" to read an
+attribute instead, and "own_text" to only match elements whose own text nodes
+contain that string (like XPath contains(text(), ...)).
+
+`extract_cards` runs a spec inside the browser; `extract_html` runs the same
+spec over saved HTML (fixtures, offline checks) with BeautifulSoup.
+"""
+from bs4 import BeautifulSoup, NavigableString
+
+# Runs in the page: reads every card's fields in one call over the CDP bridge
+EXTRACT_JS = """
+(spec) => {
+    const ownText = (el) => Array.from(el.childNodes)
+        .filter((n) => n.nodeType === Node.TEXT_NODE)
+        .map((n) => n.textContent)
+        .join("");
+
+    const pick = (card, rule) => {
+        let el = null;
+        if (rule.own_text) {
+            el = Array.from(card.querySelectorAll(rule.css))
+                .find((e) => ownText(e).includes(rule.own_text)) || null;
+        } else {
+            el = card.querySelector(rule.css);
+        }
+        if (!el) return null;
+        if (rule.attr) return el.getAttribute(rule.attr);
+        const text = (el.innerText || el.textContent || "").trim();
+        return text || null;
+    };
+
+    let cards = [];
+    for (const selector of spec.cards) {
+        cards = Array.from(document.querySelectorAll(selector));
+        if (cards.length) break;
+    }
+
+    const defaults = spec.defaults || {};
+    return cards.slice(0, spec.limit).map((card) => {
+        const item = {};
+        for (const [name, rules] of Object.entries(spec.fields)) {
+            item[name] = null;
+            for (const rule of rules) {
+                const value = pick(card, rule);
+                if (value) { item[name] = value; break; }
+            }
+            if (item[name] === null && name in defaults) item[name] = defaults[name];
+        }
+        return item;
+    });
+}
+"""
+
+AMAZON_SPEC = {
+    "cards": [
+        'div[data-component-type="s-search-result"]',
+        '.s-result-item[data-component-type="s-search-result"]',
+    ],
+    "limit": 10,
+    "fields": {
+        "title": [{"css": "h2 span"}],
+        "price": [{"css": "span.a-price > span.a-offscreen"}],
+        "rating": [{"css": "span.a-icon-alt"}],
+        "href": [
+            {"css": "h2 a", "attr": "href"},
+            {"css": ".s-product-image-container a", "attr": "href"},
+            {"css": "a", "attr": "href"},
+        ],
+    },
+}
+
+DARAZ_SPEC = {
+    "cards": [
+        "div[data-qa-locator='product-item']",
+        "div.gridItem--Yd0sa",
+    ],
+    "limit": 10,
+    "fields": {
+        "title": [{"css": "img", "attr": "alt"}],
+        "price": [{"css": "span", "own_text": "Rs."}],
+        "href": [{"css": "a", "attr": "href"}],
+    },
+}
+
+
+async def extract_cards(page, spec):
+    """Read all result cards described by `spec` with a single page.evaluate call."""
+    return await page.evaluate(EXTRACT_JS, spec)
+
+
+def _own_text(el):
+    return "".join(str(child) for child in el.children if isinstance(child, NavigableString))
+
+
+def _pick(card, rule):
+    if rule.get("own_text"):
+        el = next((e for e in card.select(rule["css"]) if rule["own_text"] in _own_text(e)), None)
+    else:
+        el = card.select_one(rule["css"])
+    if el is None:
+        return None
+    if rule.get("attr"):
+        return el.get(rule["attr"])
+    return el.get_text(" ", strip=True) or None
+
+
+def extract_html(html, spec, parser="html.parser"):
+    """Offline twin of extract_cards: apply `spec` to an HTML document string."""
+    soup = BeautifulSoup(html, parser)
+    cards = []
+    for selector in spec["cards"]:
+        cards = soup.select(selector)
+        if cards:
+            break
+
+    defaults = spec.get("defaults", {})
+    items = []
+    for card in cards[:spec["limit"]]:
+        item = {}
+        for name, rules in spec["fields"].items():
+            item[name] = next((value for value in (_pick(card, rule) for rule in rules) if value), None)
+            if item[name] is None and name in defaults:
+                item[name] = defaults[name]
+        items.append(item)
+    return items
@@ -0,0 +1,183 @@
+"""
+Recorded search result pages for offline scraper runs, checks and benchmarks.
+
+    python fixtures.py record "iphone 15" --pages 2   # save live pages (needs network)
+    python fixtures.py check                         # re-extract saved pages, flag selector regressions
+    REPLAY_FIXTURES=1 python main.py                 # scrapers read the saved pages instead of the sites
+
+Browser pages are saved as HTML snapshots and Daraz's catalog responses as
+JSON, next to a manifest.json recording each page's URL and item count.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from storage import BASE_DIR
+
+FIXTURES_DIR = os.environ.get("FIXTURES_DIR", os.path.join(BASE_DIR, "fixtures"))
+MANIFEST = "manifest.json"
+
+# Replay mode: browser contexts and the Daraz fast path serve recorded pages only
+REPLAY = os.environ.get("REPLAY_FIXTURES", "0") != "0"
+
+
+def _slug(query):
+    return re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")
+
+
+def fixture_name(retailer, query, page_number, kind):
+    """Path of a fixture relative to the fixtures directory; kind is "html" or "json"."""
+    return f"{retailer.lower()}/{_slug(query)}-p{page_number}.{kind}"
+
+
+def complete_items(items):
+    """Items usable as products (the scrapers drop cards without a title or price)."""
+    return [item for item in items if item.get("title") and item.get("price")]
+
+
+def load_manifest(directory=FIXTURES_DIR):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(retailer, query, page_number, kind, body, url, items, directory=FIXTURES_DIR):
+    """Write one recorded page and its manifest entry."""
+    name = fixture_name(retailer, query, page_number, kind)
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(body)
+
+    manifest = load_manifest(directory)
+    manifest[name] = {
+        "retailer": retailer,
+        "query": query,
+        "page": page_number,
+        "kind": kind,
+        "url": url,
+        "items": items,
+        "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_listing(retailer, query, page_number, directory=FIXTURES_DIR):
+    """Recorded catalog response body (replay of daraz_http.fetch_listing_text)."""
+    path = os.path.join(directory, fixture_name(retailer, query, page_number, "json"))
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {retailer} fixture for '{query}' page {page_number}")
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+async def install_replay(context, directory=FIXTURES_DIR):
+    """Serve recorded HTML for known page URLs in `context`; every other request is aborted."""
+    pages = {
+        entry["url"]: os.path.join(directory, name)
+        for name, entry in load_manifest(directory).items() if entry["kind"] == "html"
+    }
+
+    async def handle(route):
+        path = pages.get(route.request.url)
+        if path and route.request.resource_type == "document":
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", path=path)
+        else:
+            await route.abort()
+
+    await context.route("**/*", handle)
+
+
+def sources():
+    """Retailer -> (URL builder, extraction spec, browser profile)."""
+    # Imported here: the scrapers import daraz_http, which imports this module
+    from amazon_playwright import amazon_search_url
+    from daraz_playwright import daraz_search_url
+    from extraction import AMAZON_SPEC, DARAZ_SPEC
+    return {
+        "Amazon": (amazon_search_url, AMAZON_SPEC, "amazon"),
+        "Daraz": (daraz_search_url, DARAZ_SPEC, "daraz"),
+    }
+
+
+async def record_async(query, retailers=None, pages=1, directory=FIXTURES_DIR):
+    """Save live result pages of `query` (must run on the browser pool's loop)."""
+    from browser_pool import get_pool
+    from crawler import fetch_items
+    from daraz_http import CATALOG_URL, fetch_listing_text, parse_listing
+
+    for retailer, (build_url, spec, profile) in sources().items():
+        if retailer not in (retailers or [retailer]):
+            continue
+        spec = {**spec, "limit": 10_000}
+        for page_number in range(1, pages + 1):
+            url = build_url(query, page_number)
+            async with get_pool().page(profile) as page:
+                items = await fetch_items(page, url, spec, f"{retailer} p{page_number}", retailer=retailer)
+                html = await page.content()
+            path = save_fixture(retailer, query, page_number, "html", html, url, len(complete_items(items)), directory)
+            print(f"💾 {path}: {len(items)} items")
+
+            if retailer == "Daraz":
+                text = await asyncio.to_thread(fetch_listing_text, query, page_number)
+                items = complete_items(parse_listing(text))
+                path = save_fixture(retailer, query, page_number, "json", text, CATALOG_URL, len(items), directory)
+                print(f"💾 {path}: {len(items)} items")
+
+
+def check(directory=FIXTURES_DIR):
+    """
+    Re-extract every fixture offline and compare with the item count seen when it was recorded.
+    :return: List of (fixture name, recorded items, extracted items) that came up short
+    """
+    from daraz_http import parse_listing
+    from extraction import extract_html
+
+    specs = {retailer: spec for retailer, (_, spec, _) in sources().items()}
+    failures = []
+    for name, entry in sorted(load_manifest(directory).items()):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            body = f.read()
+        if entry["kind"] == "json":
+            items = parse_listing(body)
+        else:
+            items = extract_html(body, {**specs[entry["retailer"]], "limit": 10_000})
+        complete = complete_items(items)
+
+        ok = len(complete) >= entry["items"]
+        print(f"{'✅' if ok else '❌'} {name}: {len(complete)}/{entry['items']} items")
+        if not ok:
+            failures.append((name, entry["items"], len(complete)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and check scraper fixtures.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Save live result pages")
+    record.add_argument("query")
+    record.add_argument("--retailers", nargs="+", help="Default: all")
+    record.add_argument("--pages", type=int, default=1)
+    commands.add_parser("check", help="Re-extract saved pages offline")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        if REPLAY:
+            raise SystemExit("Unset REPLAY_FIXTURES to record live pages.")
+        from browser_pool import get_pool
+        get_pool().run(record_async(args.query, args.retailers, args.pages))
+    else:
+        if not load_manifest():
+            raise SystemExit(f"No fixtures in {FIXTURES_DIR}; record some first.")
+        sys.exit(1 if check() else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from storage import rewind
+
+MAX_PRODUCTS = 200       # LRU capacity
+REFRESH_INTERVAL = 60    # seconds before an entry is checked for newer points
+IDLE_TTL = 30 * 60       # seconds an unused entry is kept
+PREFETCH_WORKERS = 4
+
+
+class _Entry:
+    def __init__(self):
+        self.points = []
+        self.last_seen = None     # newest timestamp held
+        self.fetched_at = 0.0     # monotonic time of last fetch
+        self.used_at = 0.0        # monotonic time of last read
+
+
+class HistoryCache:
+    """
+    Per-product price history cache shared across Streamlit reruns.
+
+    Entries are refreshed incrementally: after REFRESH_INTERVAL only points from
+    WRITE_WINDOW before the last cached timestamp on are fetched, replacing that
+    tail (points share 1-second timestamps and can commit late). Least recently
+    used entries are dropped beyond `max_products`, and entries unused for
+    `idle_ttl` seconds are dropped on the next access.
+    """
+
+    def __init__(self, db, max_products=MAX_PRODUCTS, refresh_interval=REFRESH_INTERVAL, idle_ttl=IDLE_TTL):
+        self.db = db
+        self.max_products = max_products
+        self.refresh_interval = refresh_interval
+        self.idle_ttl = idle_ttl
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # Bumped by invalidate/expire so a refresh that was fetching meanwhile doesn't undo them
+        self._generation = 0
+        self._expired = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="history-prefetch")
+
+    def _evict(self, now):
+        for product_id in [pid for pid, e in self._entries.items() if now - e.used_at > self.idle_ttl]:
+            del self._entries[product_id]
+        while len(self._entries) > self.max_products:
+            self._entries.popitem(last=False)
+
+    def _refresh(self, product_id):
+        """Fetch points from just before the cached ones on (everything on first load)."""
+        with self._lock:
+            entry = self._entries.get(product_id) or _Entry()
+            start = rewind(entry.last_seen) if entry.last_seen else None
+            generation, expired = self._generation, self._expired
+
+        tail = self.db.history(product_id, start=start)
+        points = [p for p in entry.points if p["timestamp"] < start] + tail if start else tail
+
+        with self._lock:
+            if self._generation != generation:
+                # Invalidated while fetching: serve this read, but don't cache it
+                return points
+            entry.points = points
+            if points:
+                entry.last_seen = points[-1]["timestamp"]
+            now = time.monotonic()
+            # Expired while fetching: the fetch may predate the writes, so the next read checks again
+            entry.fetched_at = now if self._expired == expired else 0.0
+            entry.used_at = now
+            self._entries[product_id] = entry
+            self._entries.move_to_end(product_id)
+            self._evict(now)
+            return entry.points
+
+    def _submit(self, product_id):
+        """Start (or join) a refresh of one product; returns its future."""
+        with self._lock:
+            future = self._inflight.get(product_id)
+            if future is None:
+                future = self._executor.submit(self._refresh, product_id)
+                self._inflight[product_id] = future
+                future.add_done_callback(lambda _f, pid=product_id: self._inflight.pop(pid, None))
+            return future
+
+    def _is_fresh(self, product_id, now):
+        entry = self._entries.get(product_id)
+        return entry is not None and now - entry.fetched_at < self.refresh_interval
+
+    def get(self, product_id):
+        """Price history of one product, oldest first."""
+        now = time.monotonic()
+        with self._lock:
+            if self._is_fresh(product_id, now):
+                entry = self._entries[product_id]
+                entry.used_at = now
+                self._entries.move_to_end(product_id)
+                return entry.points
+        return self._submit(product_id).result()
+
+    def prefetch(self, product_ids):
+        """Warm the cache for several products in the background (non-blocking)."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [pid for pid in product_ids if not self._is_fresh(pid, now)]
+        return [self._submit(pid) for pid in stale]
+
+    def expire(self):
+        """Mark every entry stale (e.g. after a scrape) so the next read checks for newer points."""
+        with self._lock:
+            self._expired += 1
+            for entry in self._entries.values():
+                entry.fetched_at = 0.0
+
+    def invalidate(self, product_id=None):
+        """Drop one product (or everything) so the next read refetches from storage."""
+        with self._lock:
+            self._generation += 1
+            if product_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(product_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_history_cache(db):
+    """Process-wide history cache bound to the current storage backend."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HistoryCache(db)
+        else:
+            _cache.db = db
+        return _cache
@@ -0,0 +1,310 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from storage import BASE_DIR
+from search_index import normalize_words
+from crawler import DEFAULT_MAX_RESULTS
+import metrics
+
+JOBS_PATH = os.environ.get("JOBS_PATH", os.path.join(BASE_DIR, "scrape_jobs.db"))
+
+# Worker processes started by the dashboard (0 = run `python job_queue.py` separately)
+WORKERS = int(os.environ.get("SCRAPE_WORKERS", "2"))
+
+POLL_INTERVAL = 1.0   # seconds an idle worker sleeps between claims
+STALE_AFTER = 10 * 60  # a running job silent for this long belongs to a dead worker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    max_results INTEGER,
+    status TEXT NOT NULL,
+    results TEXT,
+    saved INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    heartbeat REAL
+);
+-- At most one queued and one running job per normalized query (a deeper
+-- follow-up can wait behind a running scrape of the same query)
+DROP INDEX IF EXISTS idx_jobs_active_query;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_queued_query ON jobs(query_key) WHERE status = 'queued';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_running_query ON jobs(query_key) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def query_key(query):
+    """Normalized form of a query, so 'Chairs' and 'chair' share one job."""
+    return " ".join(sorted(normalize_words(query or "")))
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of scrape jobs shared by the dashboard and worker processes.
+
+    A job goes queued -> running -> done/failed. Submitting a query that already
+    has a queued or running job returns that job instead of adding another one,
+    unless the new request asks for more results than a running job: then a
+    follow-up job is queued, and claimed once the running one is finished.
+    Workers append progress messages as job events, which the dashboard reads
+    incrementally with `events(job_id, after=...)`.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        # Shared by every Streamlit session thread in the dashboard process
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def _one(self, sql, params=()):
+        row = self.conn.execute(sql, params).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row):
+        data = dict(row)
+        if data.get("results"):
+            data["results"] = json.loads(data["results"])
+        return data
+
+    # --- Dashboard side ---
+
+    def submit(self, query, max_results=None):
+        """
+        Queue a scrape of `query`, or join the one already queued/running for it.
+        A deeper request is never cut short by the job it joins: a queued job's
+        max_results is raised to it, and behind a shallower running job a follow-up
+        job is queued.
+        :return: Job id
+        """
+        key = query_key(query)
+        depth = max_results or DEFAULT_MAX_RESULTS
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                queued = self._one("SELECT id, max_results FROM jobs WHERE query_key = ? AND status = 'queued'", (key,))
+                running = self._one("SELECT id, max_results FROM jobs WHERE query_key = ? AND status = 'running'", (key,))
+                if queued is not None:
+                    if depth > (queued["max_results"] or DEFAULT_MAX_RESULTS):
+                        self.conn.execute("UPDATE jobs SET max_results = ? WHERE id = ?", (depth, queued["id"]))
+                    job_id = queued["id"]
+                elif running is not None and depth <= (running["max_results"] or DEFAULT_MAX_RESULTS):
+                    job_id = running["id"]
+                else:
+                    job_id = self.conn.execute(
+                        "INSERT INTO jobs (query, query_key, max_results, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                        (query, key, max_results, _now())
+                    ).lastrowid
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get(self, job_id):
+        """Job row as a dict (status, saved, results, error, ...), or None."""
+        with self.lock:
+            return self._one("SELECT * FROM jobs WHERE id = ?", (job_id,))
+
+    def events(self, job_id, after=0):
+        """Progress messages of a job with seq > `after`, oldest first."""
+        with self.lock:
+            return [
+                dict(row) for row in self.conn.execute(
+                    "SELECT seq, message, created_at FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                    (job_id, after)
+                )
+            ]
+
+    def active(self):
+        """Queued and running jobs, oldest first."""
+        with self.lock:
+            return [
+                self._to_dict(row) for row in self.conn.execute(
+                    "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY id"
+                )
+            ]
+
+    # --- Worker side ---
+
+    def claim(self, worker=None):
+        """Atomically take the oldest queued job and mark it running; None if the queue is empty."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker died mid-scrape go back to the queue, unless a deeper
+                # follow-up for the same query is already queued
+                stale = time.time() - STALE_AFTER
+                self.conn.execute(
+                    """
+                    UPDATE jobs SET status = 'failed', error = 'Worker stopped; superseded by a queued job', finished_at = ?
+                    WHERE status = 'running' AND heartbeat < ?
+                      AND query_key IN (SELECT query_key FROM jobs WHERE status = 'queued')
+                    """,
+                    (_now(), stale)
+                )
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                    (stale,)
+                )
+                # Follow-ups wait until the running job for their query is done
+                job = self._one(
+                    """
+                    SELECT * FROM jobs WHERE status = 'queued'
+                      AND query_key NOT IN (SELECT query_key FROM jobs WHERE status = 'running')
+                    ORDER BY id LIMIT 1
+                    """
+                )
+                if job is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat = ? WHERE id = ?",
+                        (worker, _now(), time.time(), job["id"])
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def add_event(self, job_id, message):
+        """Append a progress message and refresh the job's heartbeat."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    """
+                    INSERT INTO job_events (job_id, seq, message, created_at)
+                    SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM job_events WHERE job_id = ?
+                    """,
+                    (job_id, str(message), _now(), job_id)
+                )
+                self.conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def finish(self, job_id, results):
+        """Mark a job done with scrape_all's per-retailer results."""
+        saved = sum(result.get("saved", 0) for result in results.values())
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', results = ?, saved = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(results), saved, _now(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (str(error), _now(), job_id)
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def run_job(queue, job):
+    """Run one claimed job to completion, recording progress and outcome."""
+    # Imported here so only worker processes start a browser pool
+    from scrape_orchestrator import scrape_all
+
+    try:
+        results = scrape_all(
+            job["query"],
+            report=lambda message: queue.add_event(job["id"], message),
+            max_results=job["max_results"],
+        )
+        failed = {name: r for name, r in results.items() if r["status"] != "ok"}
+        if len(failed) == len(results):
+            # Nothing came back from any retailer: the job failed rather than found nothing
+            raise RuntimeError("; ".join(f"{name}: {r.get('error', r['status'])}" for name, r in failed.items()))
+        queue.finish(job["id"], results)
+    except Exception as e:
+        queue.fail(job["id"], e)
+
+
+def worker_main(path=JOBS_PATH, stop=None, poll_interval=POLL_INTERVAL, metrics_offset=0):
+    """Worker process loop: claim queued jobs and run them until `stop` is set."""
+    metrics.serve_from_env(offset=metrics_offset)
+    queue = JobQueue(path)
+    while stop is None or not stop.is_set():
+        job = queue.claim(worker=os.getpid())
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        print(f"🛠️ Worker {os.getpid()}: scraping '{job['query']}' (job {job['id']})")
+        run_job(queue, job)
+    queue.close()
+
+
+class WorkerPool:
+    """Scrape worker processes, each with its own browser pool, pulling from one JobQueue."""
+
+    def __init__(self, workers=WORKERS, path=JOBS_PATH):
+        self.path = path
+        # Spawn, not fork: the parent (Streamlit) has threads and an event loop running
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._processes = [
+            # Worker i serves its metrics on METRICS_PORT + 1 + i (the dashboard takes METRICS_PORT)
+            self._ctx.Process(
+                target=worker_main, args=(path, self._stop, POLL_INTERVAL, i + 1),
+                name=f"scrape-worker-{i}", daemon=True
+            )
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        return self
+
+    def join(self):
+        for process in self._processes:
+            process.join()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    # Standalone workers, e.g. with SCRAPE_WORKERS=0 for the dashboard
+    workers = max(WORKERS, 1)
+    pool = WorkerPool(workers=workers).start()
+    print(f"🛠️ {workers} scrape workers polling {pool.path}")
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,222 @@
+"""
+Cross-retailer product matching: clusters listings of the same product.
+
+Each new listing is compared only with listings in its blocks (products that
+share at least MIN_SHARED_TOKENS informative title tokens), never with the
+whole catalog. Candidates are pruned with a MinHash estimate of token Jaccard
+similarity and then scored with TF-IDF cosine similarity, both as single NumPy
+operations over the candidate set. Matches are merged with union-find, so a
+cluster grows incrementally as listings are added.
+"""
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+import pandas as pd
+from search_index import normalize_words
+from normalization import to_pkr
+
+MATCH_THRESHOLD = 0.6     # TF-IDF cosine for two listings to be the same product
+MIN_JACCARD = 0.25        # MinHash estimate below which TF-IDF is not computed
+MIN_SHARED_TOKENS = 2     # blocking: informative tokens a candidate must share
+MAX_BLOCK_SIZE = 300      # tokens in more listings than this are too common to block on
+MINHASH_PERMUTATIONS = 64
+
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "of", "in", "on", "to", "by", "new",
+    "pack", "packs", "set", "sets", "original", "originals", "pcs",
+}
+
+# Universal hashing h(x) = (a*x + b) mod p, one (a, b) per permutation
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(7)
+_A = _rng.integers(1, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def title_tokens(title):
+    """
+    Informative keywords of a title: normalize_words with each singular/plural
+    pair collapsed to one token (so a shared word counts once) and stopwords removed.
+    """
+    words = normalize_words(title or "")
+    tokens = set()
+    for word in words:
+        if word.endswith("s") and word[:-1] in words and len(word) > 3:
+            word = word[:-1]
+        if word not in STOPWORDS and len(word) > 1:
+            tokens.add(word)
+    return frozenset(tokens)
+
+
+def minhash(tokens):
+    """MinHash signature of a token set (uint64 array of MINHASH_PERMUTATIONS)."""
+    if not tokens:
+        return np.full(MINHASH_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    x = np.array([zlib.crc32(t.encode("utf-8")) % _PRIME for t in tokens], dtype=np.uint64)
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def _numbers(tokens):
+    return frozenset(t for t in tokens if any(c.isdigit() for c in t))
+
+
+def _conflict(numbers, other):
+    """
+    Conflicting model numbers / sizes ("128gb" vs "256gb") never match; one side
+    merely listing extra numbers ("6.1 inch") still can.
+    """
+    return bool(numbers and other and not (numbers <= other or other <= numbers))
+
+
+class ProductMatcher:
+    """
+    Incremental clustering of listings into canonical products.
+    Cluster ids are the id of the cluster's first listing, so they stay stable as it grows.
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._tokens = {}       # product id -> token set
+        self._signatures = {}   # product id -> MinHash signature
+        self._postings = {}     # token -> set of product ids
+        self._parent = {}       # union-find
+        self._numbers = {}      # cluster root -> numbers in any of its titles
+        self._order = {}        # product id -> insertion number
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    # --- Union-find ---
+
+    def _find(self, pid):
+        root = pid
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[pid] != root:
+            self._parent[pid], pid = root, self._parent[pid]
+        return root
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            # The older cluster absorbs the newer one
+            if self._order[rb] < self._order[ra]:
+                ra, rb = rb, ra
+            self._parent[rb] = ra
+            self._numbers[ra] = self._numbers[ra] | self._numbers.pop(rb)
+
+    # --- Matching ---
+
+    def _candidates(self, tokens):
+        needed = min(MIN_SHARED_TOKENS, len(tokens))
+        postings = sorted((self._postings[t] for t in tokens if self._postings.get(t)), key=len)
+        # Common tokens are skipped only while enough rarer ones are left to block
+        # on; a title made of common tokens falls back to its rarest ones
+        rare = sum(len(ids) <= MAX_BLOCK_SIZE for ids in postings)
+        shared = Counter()
+        for ids in postings[:max(rare, needed)]:
+            shared.update(ids)
+        return [pid for pid, n in shared.items() if n >= needed]
+
+    def _scores(self, tokens, signature, candidates):
+        """TF-IDF cosine between a listing and each candidate (0 for pruned ones)."""
+        signatures = np.stack([self._signatures[c] for c in candidates])
+        jaccard = (signatures == signature).mean(axis=1)
+        keep = np.flatnonzero(jaccard >= MIN_JACCARD)
+        scores = np.zeros(len(candidates))
+        if not len(keep):
+            return scores
+
+        kept = [candidates[i] for i in keep]
+        vocab = {t: i for i, t in enumerate(set(tokens).union(*(self._tokens[c] for c in kept)))}
+        n = len(self._tokens) + 1
+        idf = np.empty(len(vocab))
+        for token, i in vocab.items():
+            idf[i] = np.log((1 + n) / (1 + len(self._postings.get(token, ())))) + 1
+
+        matrix = np.zeros((len(kept) + 1, len(vocab)))
+        for row, toks in enumerate([tokens, *(self._tokens[c] for c in kept)]):
+            matrix[row, [vocab[t] for t in toks]] = 1.0
+        matrix *= idf
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+        scores[keep] = matrix[1:] @ matrix[0]
+        return scores
+
+    def add(self, pid, title):
+        """Add one listing and merge it into every cluster it matches; returns its cluster id."""
+        with self._lock:
+            if pid in self._tokens:
+                return self._find(pid)
+            tokens = title_tokens(title)
+            signature = minhash(tokens)
+            candidates = self._candidates(tokens)
+
+            self._order[pid] = len(self._order)
+            self._parent[pid] = pid
+            self._numbers[pid] = _numbers(tokens)
+            if candidates:
+                for candidate, score in zip(candidates, self._scores(tokens, signature, candidates)):
+                    if score < self.threshold:
+                        continue
+                    # Checked cluster against cluster: matching is not transitive, so a listing
+                    # that fits one member must not pull in sizes another member rules out
+                    ours, theirs = self._find(pid), self._find(candidate)
+                    if not _conflict(self._numbers[ours], self._numbers[theirs]):
+                        self._union(pid, candidate)
+
+            self._tokens[pid] = tokens
+            self._signatures[pid] = signature
+            for token in tokens:
+                self._postings.setdefault(token, set()).add(pid)
+            return self._find(pid)
+
+    def add_many(self, listings):
+        """Add (product id, title) pairs; already known ids are skipped."""
+        for pid, title in listings:
+            if pid not in self._tokens:
+                self.add(pid, title)
+
+    def cluster_of(self, pid):
+        with self._lock:
+            return self._find(pid) if pid in self._parent else pid
+
+    def cluster_ids(self, pids):
+        """Cluster id for each product id (its own id if never added)."""
+        with self._lock:
+            return [self._find(pid) if pid in self._parent else pid for pid in pids]
+
+
+def _with_pkr(df):
+    currencies = df["currency"] if "currency" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    return df.assign(price_pkr=to_pkr(df["price_numeric"], currencies))
+
+
+def one_per_cluster(df):
+    """The cheapest listing of each cluster (listings without a match pass through)."""
+    if df.empty or "cluster_id" not in df.columns:
+        return df
+    return _with_pkr(df).sort_values("price_pkr").drop_duplicates("cluster_id")
+
+
+def cheapest_offers(df):
+    """
+    One row per matched product (cluster with listings from 2+ retailers): the cheapest
+    offer with its price in rupees, how many listings and stores carry it, and the
+    price gap to the most expensive listing.
+    :param df: Cleaned products with id, title, retailer, url, price, price_numeric, currency, cluster_id
+    """
+    if df.empty or "cluster_id" not in df.columns:
+        return df.iloc[0:0]
+
+    offers = _with_pkr(df)
+    grouped = offers.groupby("cluster_id")
+    stats = grouped.agg(
+        listings=("id", "size"), stores=("retailer", "nunique"), highest_pkr=("price_pkr", "max")
+    )
+    cheapest = offers.sort_values("price_pkr").drop_duplicates("cluster_id").set_index("cluster_id")
+    result = cheapest.join(stats)
+    result = result[result["stores"] >= 2]
+    result["saving_pkr"] = result["highest_pkr"] - result["price_pkr"]
+    return result.reset_index().sort_values("saving_pkr", ascending=False)
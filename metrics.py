@@ -0,0 +1,191 @@
+"""
+Lightweight timing spans for the scrape, store and render hot paths.
+
+    with span("search", backend="sqlite"):
+        ...
+
+    @timed("cleaning")
+    def prepare_products(df): ...
+
+Every span updates an in-process histogram (served in Prometheus text format
+when METRICS_PORT is set) and, when METRICS_JSONL is set, appends one JSON line
+per span so timings from every process (dashboard, workers, scheduler) can be
+analysed together.
+"""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JSONL_PATH = os.environ.get("METRICS_JSONL")
+PORT = int(os.environ["METRICS_PORT"]) if os.environ.get("METRICS_PORT") else None
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Series:
+    """Histogram of one span name + label set."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error):
+        self.count += 1
+        self.total += seconds
+        self.errors += error
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+_series = {}
+_lock = threading.Lock()
+_jsonl_lock = threading.Lock()
+_local = threading.local()
+
+
+def record(name, seconds, labels=None, error=False):
+    """Record one finished span."""
+    labels = labels or {}
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = _Series()
+        series.observe(seconds, error)
+
+    collected = getattr(_local, "spans", None)
+    if collected is not None:
+        collected.append({"span": name, **labels, "ms": round(seconds * 1000, 2), "error": error})
+
+    if JSONL_PATH:
+        line = json.dumps({
+            "ts": round(time.time(), 3), "pid": os.getpid(), "span": name,
+            "labels": labels, "seconds": round(seconds, 6), "error": error,
+        })
+        with _jsonl_lock, open(JSONL_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the enclosed block; exceptions are recorded as errors and re-raised."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, labels, error)
+
+
+def timed(name=None, **labels):
+    """Decorator form of `span` for sync and async functions (defaults to the function name)."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Per-thread collection (e.g. one Streamlit rerun) ---
+
+def start_collecting():
+    """Also keep the spans finished on this thread in a list, returned here."""
+    _local.spans = []
+    return _local.spans
+
+
+def stop_collecting():
+    spans = getattr(_local, "spans", None) or []
+    _local.spans = None
+    return spans
+
+
+# --- Prometheus export ---
+
+def _label_text(name, labels, extra=()):
+    pairs = [("span", name), *labels, *extra]
+    return ",".join(f'{key}="{str(value)}"' for key, value in pairs)
+
+
+def prometheus_text():
+    """All span histograms in Prometheus text exposition format."""
+    with _lock:
+        snapshot = [(key, list(s.buckets), s.count, s.total, s.errors) for key, s in _series.items()]
+
+    lines = [
+        "# HELP scraper_span_seconds Duration of instrumented operations.",
+        "# TYPE scraper_span_seconds histogram",
+    ]
+    for (name, labels), buckets, count, total, _ in snapshot:
+        for bound, n in zip(BUCKETS, buckets):
+            lines.append(f"scraper_span_seconds_bucket{{{_label_text(name, labels, [('le', bound)])}}} {n}")
+        lines.append(f"scraper_span_seconds_bucket{{{_label_text(name, labels, [('le', '+Inf')])}}} {count}")
+        lines.append(f"scraper_span_seconds_sum{{{_label_text(name, labels)}}} {total:.6f}")
+        lines.append(f"scraper_span_seconds_count{{{_label_text(name, labels)}}} {count}")
+
+    lines += [
+        "# HELP scraper_span_errors_total Instrumented operations that raised.",
+        "# TYPE scraper_span_errors_total counter",
+    ]
+    for (name, labels), _, _, _, errors in snapshot:
+        lines.append(f"scraper_span_errors_total{{{_label_text(name, labels)}}} {errors}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port):
+    """Serve /metrics on `port` from a background thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def serve_from_env(offset=0):
+    """Start the endpoint on METRICS_PORT + offset if configured (one port per process)."""
+    if PORT is None:
+        return None
+    try:
+        server = serve(PORT + offset)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint on port {PORT + offset} unavailable: {e}")
+        return None
+    print(f"📈 Metrics at http://localhost:{PORT + offset}/metrics")
+    return server
@@ -0,0 +1,20 @@
+from storage import open_database
+
+
+def main():
+    """
+    One-off backfill: store price_value/currency/rating_value on products and
+    price_value on history points saved before ingest-time parsing existed.
+    Safe to re-run; rows that already have the fields are skipped.
+    """
+    print("🔄 Backfilling numeric price and rating fields...")
+    db = open_database()
+    try:
+        products, points = db.backfill_numeric_fields()
+    finally:
+        db.close()
+    print(f"✅ Updated {products} products and {points} history points.")
+
+
+if __name__ == "__main__":
+    main()
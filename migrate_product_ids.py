@@ -0,0 +1,21 @@
+from storage import open_database
+
+
+def main():
+    """
+    One-off migration for Firestore data saved before deterministic product ids:
+    move each product and its price history to its product_id, merging with the
+    copy a later scrape stored there, and update the keyword index to match.
+    Safe to re-run; products already at their product_id are skipped.
+    """
+    print("🔄 Moving products to deterministic ids...")
+    db = open_database()
+    try:
+        moved, merged = db.rekey_products()
+    finally:
+        db.close()
+    print(f"✅ Moved {moved} products ({merged} merged into an existing copy).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# First number in the string, e.g. "Rs. 1,299" -> 1299 (commas are stripped first)
+NUMBER_PATTERN = r"(\d+(?:\.\d+)?)"
+_NUMBER = re.compile(NUMBER_PATTERN)
+
+# Currency markers as they appear in scraped price strings
+CURRENCY_PATTERNS = {
+    "PKR": r"Rs\.?|PKR|₨",
+    "USD": r"\$|USD",
+}
+_CURRENCIES = {code: re.compile(pattern) for code, pattern in CURRENCY_PATTERNS.items()}
+
+# Rupees per unit of each currency, for comparing offers across retailers (PKR_PER_USD overrides)
+PKR_RATES = {
+    "PKR": 1.0,
+    "USD": float(os.environ.get("PKR_PER_USD", "280")),
+}
+
+
+# --- Scalar parsers (single values, e.g. at ingest time) ---
+
+def parse_price(value):
+    """Converts a price ("Rs. 1,299", "$19.99", 1299) to float; 0.0 if unparseable."""
+    if isinstance(value, (int, float)) and not pd.isna(value):
+        return float(value)
+    if not isinstance(value, str):
+        return 0.0
+    match = _NUMBER.search(value.replace(",", ""))
+    return float(match.group(1)) if match else 0.0
+
+
+def parse_rating(value):
+    """Converts a rating ("4.3 out of 5 stars", 4.3) to float 0-5; 0.0 if missing or out of range."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return 0.0
+    match = _NUMBER.search(str(value))
+    if match:
+        val = float(match.group(1))
+        return val if 0 <= val <= 5 else 0.0
+    return 0.0
+
+
+def detect_currency(value):
+    """Currency code ("PKR", "USD") found in a price string, or None."""
+    if not isinstance(value, str):
+        return None
+    for code, pattern in _CURRENCIES.items():
+        if pattern.search(value):
+            return code
+    return None
+
+
+# --- Vectorized parsers (whole DataFrame columns) ---
+
+def _as_series(values):
+    return values if isinstance(values, pd.Series) else pd.Series(values)
+
+
+def parse_prices(values):
+    """Vectorized parse_price over a column; returns a float Series."""
+    s = _as_series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float).fillna(0.0)
+    numbers = (
+        s.astype(str)
+        .str.replace(",", "", regex=False)
+        .str.extract(NUMBER_PATTERN, expand=False)
+    )
+    return pd.to_numeric(numbers, errors="coerce").fillna(0.0)
+
+
+def parse_ratings(values):
+    """Vectorized parse_rating over a column; returns a float Series clipped to 0-5."""
+    s = _as_series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        ratings = s.astype(float)
+    else:
+        ratings = pd.to_numeric(s.astype(str).str.extract(NUMBER_PATTERN, expand=False), errors="coerce")
+    ratings = ratings.fillna(0.0)
+    return ratings.where((ratings >= 0) & (ratings <= 5), 0.0)
+
+
+def detect_currencies(values):
+    """Vectorized detect_currency over a column; returns an object Series (None if unknown)."""
+    s = _as_series(values)
+    # Non-strings become "None"/"nan"/digits, none of which contain a currency marker
+    text = s.astype(str)
+    conditions = [text.str.contains(pattern, regex=True) for pattern in CURRENCY_PATTERNS.values()]
+    codes = np.select(conditions, list(CURRENCY_PATTERNS), default=None)
+    return pd.Series(codes, index=s.index, dtype=object)
+
+
+def value_scores(ratings, prices):
+    """Rating per price unit (rating scaled by 10), 0 where price is not positive."""
+    ratings = np.asarray(ratings, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    scores = np.zeros_like(prices)
+    np.divide(ratings * 10, prices, out=scores, where=prices > 0)
+    return scores
+
+
+def to_pkr(prices, currencies):
+    """Prices converted to rupees using PKR_RATES; unknown currencies are taken as PKR."""
+    rates = _as_series(currencies).map(PKR_RATES).fillna(1.0).to_numpy(float)
+    return np.asarray(prices, dtype=float) * rates
+
+
+def stored_or_parsed(df, value_column, raw_column, parser):
+    """
+    Numeric column stored at ingest time (e.g. price_value), parsing the raw
+    strings with `parser` only for rows written before it existed.
+    """
+    if raw_column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    if value_column not in df.columns:
+        return parser(df[raw_column])
+
+    values = pd.to_numeric(df[value_column], errors="coerce")
+    missing = values.isna()
+    if missing.any():
+        values = values.copy()
+        values[missing] = parser(df.loc[missing, raw_column])
+    return values
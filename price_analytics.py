@@ -2,11 +2,18 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 from datetime import datetime
+from normalization import parse_prices, stored_or_parsed
+from history_cache import get_history_cache
+from metrics import span
+
+# Products (in display order) whose history is fetched ahead of selection
+PREFETCH_TOP_N = 10
 
 def show_price_trend(df, db_helper):
     """
-    Displays a mobile-friendly price history chart for a selected product.
-    Fetches data from the 'history' subcollection in Firestore.
+    Displays price metrics and an on-demand history chart for a selected product.
+    Metrics come from aggregates stored on the product; the price history is
+    only fetched when the chart is opened.
 
     Optimized for:
     - Mobile scrolling stability
@@ -39,15 +46,46 @@ def show_price_trend(df, db_helper):
     doc_id = selected_row['id']
     product_title = selected_row['title']
 
-    # 🔹 Fetch history subcollection
-    history_ref = db_helper.collection.document(doc_id).collection("history")
-    history_docs = history_ref.stream()
+    # 🔹 Stacked metrics (mobile-safe), from aggregates kept on the product doc
+    aggregates = _row_aggregates(selected_row)
+    if aggregates is None:
+        # Product saved before aggregates existed: derive them from its history
+        aggregates = _history_aggregates(get_history_cache(db_helper).get(doc_id))
+        if aggregates is None:
+            st.info("Not enough historical data collected yet. Try scraping again later.")
+            return
+
+    # 🔹 History is only read when the chart is opened
+    if st.toggle("📊 View Price History Chart", value=False, key="show_history_chart"):
+        _show_history_chart(db_helper, df, doc_id, product_title)
+
+    st.metric("📉 Lowest Recorded Price", f"{aggregates['price_min']:,.0f} Rs.")
+    st.metric("📈 Highest Recorded Price", f"{aggregates['price_max']:,.0f} Rs.")
+    st.metric("🧾 Data Points Collected", f"{aggregates['price_count']}")
+
 
-    history_data = []
-    for doc in history_docs:
-        h = doc.to_dict()
-        if 'timestamp' in h and 'price' in h:
-            history_data.append(h)
+def _row_aggregates(row):
+    """Min/max/count stored on the product, or None if this product has none yet."""
+    values = {field: row.get(field) for field in ("price_min", "price_max", "price_count")}
+    if any(value is None or pd.isna(value) for value in values.values()):
+        return None
+    return values
+
+
+def _history_aggregates(history_data):
+    if not history_data:
+        return None
+    prices = stored_or_parsed(pd.DataFrame(history_data), 'price_value', 'price', parse_prices)
+    return {"price_min": prices.min(), "price_max": prices.max(), "price_count": len(prices)}
+
+
+def _show_history_chart(db_helper, df, doc_id, product_title):
+    # 🔹 Fetch price history (cached; only newer points are read from storage)
+    history_cache = get_history_cache(db_helper)
+    history_data = history_cache.get(doc_id)
+
+    # 🔹 Warm the cache for the other listed products so switching is instant
+    history_cache.prefetch(df['id'].head(PREFETCH_TOP_N).tolist())
 
     if not history_data:
         st.info("Not enough historical data collected yet. Try scraping again later.")
@@ -57,36 +95,29 @@ def show_price_trend(df, db_helper):
     hist_df = pd.DataFrame(history_data)
     hist_df['timestamp'] = pd.to_datetime(hist_df['timestamp'])
 
-    def clean_price(p):
-        if isinstance(p, (int, float)):
-            return float(p)
-        import re
-        clean = str(p).replace(",", "").replace("Rs.", "").replace("PKR", "").strip()
-        match = re.search(r"(\d+(\.\d+)?)", clean)
-        return float(match.group(1)) if match else 0.0
-
-    hist_df['price_val'] = hist_df['price'].apply(clean_price)
+    hist_df['price_val'] = stored_or_parsed(hist_df, 'price_value', 'price', parse_prices)
     hist_df = hist_df.sort_values('timestamp')
 
-    # 🔹 Mobile-friendly chart (NO interaction)
-    chart = alt.Chart(hist_df).mark_line(point=True).encode(
-        x=alt.X(
-            'timestamp:T',
-            title='Date',
-            axis=alt.Axis(format='%d %b')
-        ),
-        y=alt.Y('price_val:Q', title='Price (Rs.)'),
-        tooltip=['price_val']
-    ).properties(
-        title=f"Price Trend: {product_title[:40]}",
-        height=250
-    )
+    # 🔹 Points are only stored when the price changes, so hold the last price
+    # until the product was last updated
+    last_updated = pd.to_datetime(df.loc[df['id'] == doc_id, 'last_updated'].iloc[0]) if 'last_updated' in df.columns else None
+    if last_updated is not None and not pd.isna(last_updated) and last_updated > hist_df['timestamp'].iloc[-1]:
+        tail = hist_df.iloc[[-1]].assign(timestamp=last_updated)
+        hist_df = pd.concat([hist_df, tail], ignore_index=True)
+
+    # 🔹 Mobile-friendly chart (NO interaction); the span covers spec build and serialization
+    with span("chart_build", chart="price_history"):
+        chart = alt.Chart(hist_df).mark_line(point=True, interpolate='step-after').encode(
+            x=alt.X(
+                'timestamp:T',
+                title='Date',
+                axis=alt.Axis(format='%d %b')
+            ),
+            y=alt.Y('price_val:Q', title='Price (Rs.)'),
+            tooltip=['price_val']
+        ).properties(
+            title=f"Price Trend: {product_title[:40]}",
+            height=250
+        )
 
-    # 🔹 Wrap chart to prevent auto-scroll jump
-    with st.expander("📊 View Price History Chart", expanded=False):
         st.altair_chart(chart, use_container_width=True)
-
-    # 🔹 Stacked metrics (mobile-safe)
-    st.metric("📉 Lowest Recorded Price", f"{hist_df['price_val'].min():,.0f} Rs.")
-    st.metric("📈 Highest Recorded Price", f"{hist_df['price_val'].max():,.0f} Rs.")
-    st.metric("🧾 Data Points Collected", f"{len(hist_df)}")
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from playwright.async_api import TimeoutError, Error as PlaywrightError
+
+# Per-retailer pacing: requests/second refill, bucket size, concurrency range,
+# and the page latency (seconds) above which we treat the site as strained
+LIMITS = {
+    "Amazon": {"rate": 0.5, "burst": 2, "min_concurrency": 1, "max_concurrency": 3, "slow_after": 12.0},
+    "Daraz": {"rate": 2.0, "burst": 4, "min_concurrency": 1, "max_concurrency": 6, "slow_after": 8.0},
+}
+DEFAULT_LIMITS = {"rate": 1.0, "burst": 2, "min_concurrency": 1, "max_concurrency": 2, "slow_after": 10.0}
+
+MAX_ATTEMPTS = 3
+BASE_DELAY = 2.0       # seconds before the first retry
+MAX_DELAY = 60.0
+BLOCK_COOLDOWN = 30.0  # extra pause for every request after a captcha/block page
+
+# Text or URL fragments of anti-bot pages served instead of results
+BLOCK_MARKERS = (
+    "/errors/validateCaptcha",
+    "Enter the characters you see below",
+    "api-services-support@amazon.com",
+    "rgv587_flag",
+    "FAIL_SYS_USER_VALIDATE",
+    "/punish",
+    "x5secdata",
+)
+
+
+class Blocked(Exception):
+    """The retailer answered with a captcha/anti-bot page or a blocking status code."""
+
+
+# Failures worth another attempt after backing off
+RETRYABLE = (Blocked, TimeoutError, PlaywrightError, asyncio.TimeoutError, ConnectionError)
+
+
+def is_block_page(text):
+    return any(marker in (text or "") for marker in BLOCK_MARKERS)
+
+
+async def check_blocked(page):
+    """Raise Blocked if `page` shows a captcha/anti-bot page instead of results."""
+    if is_block_page(page.url):
+        raise Blocked(f"redirected to {page.url}")
+    body = await page.evaluate("() => document.documentElement ? document.documentElement.outerHTML.slice(0, 20000) : ''")
+    if is_block_page(body):
+        raise Blocked("captcha page")
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Requests are spaced to `rate` per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Hand out no tokens for `seconds` (e.g. after a block page)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class RetailerLimiter:
+    """
+    Token bucket plus an AIMD concurrency limit for one retailer.
+
+    Every fast, successful request raises the limit by 1/limit (about +1 per
+    round of requests); an error, block or slow response halves it. Pages wait
+    for both a token and a free slot under the current limit.
+    """
+
+    def __init__(self, name, rate, burst, min_concurrency, max_concurrency, slow_after):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.slow_after = slow_after
+
+        self.limit = float(min_concurrency)
+        self.in_flight = 0
+        self._slots = asyncio.Condition()
+
+    def _increase(self):
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def _decrease(self):
+        self.limit = max(self.min_concurrency, self.limit / 2)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a concurrency slot and a token; outcome and latency adjust the limit."""
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+        try:
+            # Inside the try: a task cancelled while waiting for a token still frees its slot
+            await self.bucket.acquire()
+            started = time.monotonic()
+            yield
+        except Blocked:
+            self._decrease()
+            self.bucket.pause(BLOCK_COOLDOWN)
+            raise
+        except Exception:
+            self._decrease()
+            raise
+        else:
+            if time.monotonic() - started > self.slow_after:
+                self._decrease()
+            else:
+                self._increase()
+        finally:
+            async with self._slots:
+                self.in_flight -= 1
+                self._slots.notify_all()
+
+    async def call(self, fetch, attempts=MAX_ATTEMPTS, label=None):
+        """
+        Run `fetch()` (a coroutine factory) under the limiter, retrying retryable
+        failures with exponential backoff and jitter.
+        """
+        for attempt in range(attempts):
+            try:
+                async with self.slot():
+                    return await fetch()
+            except RETRYABLE as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"🔁 {label or self.name}: {type(e).__name__} ({e}); retry {attempt + 1} in {delay:.1f}s "
+                      f"(concurrency limit {self.limit:.1f})")
+                await asyncio.sleep(delay)
+
+
+_limiters = {}
+
+
+def get_limiter(retailer):
+    """Process-wide limiter for a retailer, shared by every concurrent crawl."""
+    limiter = _limiters.get(retailer)
+    if limiter is None:
+        limiter = RetailerLimiter(retailer, **LIMITS.get(retailer, DEFAULT_LIMITS))
+        _limiters[retailer] = limiter
+    return limiter
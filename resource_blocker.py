@@ -0,0 +1,137 @@
+import time
+from contextlib import contextmanager
+
+# Resource types never needed to read titles, prices, ratings and links
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Analytics, tracking and ad hosts seen on Amazon and Daraz result pages
+BLOCKED_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "amazon-adsystem.com",
+    "fls-na.amazon.com",
+    "unagi.amazon.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "scorecardresearch.com",
+    "criteo.com",
+    "hotjar.com",
+    "mmstat.com",
+    "arms-retcode.aliyuncs.com",
+    "g.alicdn.com/alilog",
+)
+
+# Typical transfer sizes, used to estimate what a blocked request would have cost
+ESTIMATED_BYTES = {
+    "image": 35_000,
+    "media": 250_000,
+    "font": 45_000,
+    "script": 30_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+# Pages currently being measured: page -> PageLoadStats
+_active = {}
+
+
+def should_block(request):
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    url = request.url
+    return any(domain in url for domain in BLOCKED_DOMAINS)
+
+
+class PageLoadStats:
+    """Bytes and time for one page load with resource blocking on."""
+
+    def __init__(self, fixed_wait=0.0):
+        """
+        :param fixed_wait: Seconds the old code slept unconditionally after navigation,
+                           used to report how much waiting the selector wait saved
+        """
+        self.fixed_wait = fixed_wait
+        self.started = time.perf_counter()
+        self.ready_at = None
+        self.wait_started = None
+        self.bytes_loaded = 0
+        self.requests_loaded = 0
+        self.blocked = {}
+
+    def on_response(self, response):
+        self.requests_loaded += 1
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    def on_blocked(self, request):
+        kind = request.resource_type
+        self.blocked[kind] = self.blocked.get(kind, 0) + 1
+
+    def start_wait(self):
+        """Call right before waiting for the product cards."""
+        self.wait_started = time.perf_counter()
+
+    def mark_ready(self):
+        """Call once the product cards are on the page."""
+        self.ready_at = time.perf_counter()
+
+    @property
+    def load_seconds(self):
+        return (self.ready_at or time.perf_counter()) - self.started
+
+    @property
+    def wait_saved_seconds(self):
+        if self.wait_started is None or self.ready_at is None:
+            return 0.0
+        return max(0.0, self.fixed_wait - (self.ready_at - self.wait_started))
+
+    @property
+    def bytes_saved_estimate(self):
+        return sum(ESTIMATED_BYTES.get(kind, DEFAULT_ESTIMATED_BYTES) * n for kind, n in self.blocked.items())
+
+    def summary(self, label):
+        blocked_total = sum(self.blocked.values())
+        return (
+            f"⚡ {label}: ready in {self.load_seconds:.2f}s "
+            f"(~{self.wait_saved_seconds:.2f}s less than fixed wait), "
+            f"{self.requests_loaded} requests / {self.bytes_loaded / 1024:,.0f} KB loaded, "
+            f"{blocked_total} blocked (~{self.bytes_saved_estimate / 1024:,.0f} KB saved)"
+        )
+
+
+async def _handle_route(route):
+    request = route.request
+    if not should_block(request):
+        await route.continue_()
+        return
+
+    try:
+        stats = _active.get(request.frame.page)
+    except Exception:
+        # Service worker requests have no frame
+        stats = None
+    if stats is not None:
+        stats.on_blocked(request)
+    await route.abort()
+
+
+async def install(context):
+    """Block images, fonts, media and ad/analytics hosts for every page in `context`."""
+    await context.route("**/*", _handle_route)
+
+
+@contextmanager
+def measure(page, fixed_wait=0.0):
+    """Collect PageLoadStats for `page` while the block is active."""
+    stats = PageLoadStats(fixed_wait)
+    _active[page] = stats
+    page.on("response", stats.on_response)
+    try:
+        yield stats
+    finally:
+        page.remove_listener("response", stats.on_response)
+        _active.pop(page, None)
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+from browser_pool import get_pool
+from scrape_orchestrator import RETAILERS, scrape_all_async
+from job_queue import WORKERS
+from storage import BASE_DIR, open_database
+import metrics
+
+WATCHLIST_PATH = os.environ.get("WATCHLIST_PATH", os.path.join(BASE_DIR, "watchlist.json"))
+# When each target was last refreshed: unchanged products are not rewritten, so storage can't tell
+CHECKED_PATH = os.environ.get("SCHEDULER_CHECKED_PATH", os.path.join(BASE_DIR, "scheduler_checked.json"))
+
+DEFAULT_INTERVAL = 6 * 60      # minutes between refreshes of a watchlist entry
+DEFAULT_MAX_RESULTS = 20       # results per retailer for a query entry
+PRODUCT_MAX_RESULTS = 5        # results per retailer when refreshing one product by title
+TICK_SECONDS = 15              # how often due targets are dispatched
+
+# Volatile targets are refreshed sooner: interval / (1 + VOLATILITY_WEIGHT * volatility)
+VOLATILITY_WEIGHT = 4.0
+
+# Concurrency: scrapes running at once overall and per retailer
+MAX_CONCURRENT = 3
+RETAILER_CONCURRENCY = {
+    "Amazon": 1,
+    "Daraz": 2,
+}
+
+# Rate budgets: at most N scrapes per window (seconds) per retailer
+RATE_BUDGETS = {
+    "Amazon": (20, 3600),
+    "Daraz": (60, 3600),
+}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.strptime(value, TIME_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+def volatility(products):
+    """
+    Typical relative price movement of a set of products: the median coefficient
+    of variation of their recent prices (0 for products seen at one price).
+    """
+    scores = []
+    for product in products:
+        prices = [p for p in product.get("recent_prices") or [] if p]
+        if len(prices) >= 2:
+            scores.append(statistics.pstdev(prices) / statistics.fmean(prices))
+        elif product.get("price_min") and product.get("price_max"):
+            scores.append((product["price_max"] - product["price_min"]) / product["price_max"])
+    return statistics.median(scores) if scores else 0.0
+
+
+class Target:
+    """One watchlist item on one retailer: what to scrape and when it was last fresh."""
+
+    def __init__(self, query, retailer, interval=DEFAULT_INTERVAL, max_results=DEFAULT_MAX_RESULTS, product_ids=None):
+        """
+        :param interval: Minutes between refreshes before volatility is applied
+        :param product_ids: Tracked products; staleness comes from these instead of the query's results
+        """
+        self.query = query
+        self.retailer = retailer
+        self.interval = interval * 60
+        self.max_results = max_results
+        self.product_ids = product_ids
+        self.last_updated = None   # datetime of the newest data we hold
+        self.volatility = 0.0
+
+    @property
+    def key(self):
+        return (self.query.lower(), self.retailer)
+
+    @property
+    def checked_key(self):
+        return f"{self.retailer}|{self.query.lower()}"
+
+    def effective_interval(self):
+        return self.interval / (1 + VOLATILITY_WEIGHT * self.volatility)
+
+    def priority(self, now):
+        """How overdue the target is (>= 1 means due); never scraped targets come first."""
+        if self.last_updated is None:
+            return float("inf")
+        return (now - self.last_updated).total_seconds() / self.effective_interval()
+
+    def update_stats(self, products):
+        """Set staleness and volatility from the stored products this target keeps fresh."""
+        products = [p for p in products if p.get("retailer") == self.retailer]
+        times = [t for t in (_parse_time(p.get("last_updated")) for p in products) if t]
+        self.last_updated = max(times) if times else None
+        self.volatility = volatility(products)
+
+
+def load_watchlist(path=WATCHLIST_PATH, db=None):
+    """
+    Read the watchlist file into Targets. Entries look like
+        {"query": "iphone 15", "interval": 120, "retailers": ["Daraz"], "max_results": 30}
+        {"product_id": "3f2a...", "interval": 60}
+    Product entries are refreshed by searching their stored title on their retailer.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    product_entries = {e["product_id"]: e for e in entries if "product_id" in e}
+    products = {p["id"]: p for p in db.latest(product_ids=list(product_entries))} if product_entries and db else {}
+
+    targets = {}
+    for entry in entries:
+        interval = entry.get("interval", DEFAULT_INTERVAL)
+        if "product_id" in entry:
+            product = products.get(entry["product_id"])
+            if product is None:
+                print(f"⚠️ Watchlist product {entry['product_id']} not found; skipping.")
+                continue
+            target = Target(product["title"], product["retailer"], interval,
+                            entry.get("max_results", PRODUCT_MAX_RESULTS), [product["id"]])
+            existing = targets.get(target.key)
+            if existing and existing.product_ids is not None:
+                # Several tracked products with the same title share one scrape
+                existing.product_ids.append(product["id"])
+                existing.interval = min(existing.interval, target.interval)
+                continue
+            targets.setdefault(target.key, target)
+        else:
+            for retailer in entry.get("retailers") or list(RETAILERS):
+                target = Target(entry["query"], retailer, interval, entry.get("max_results", DEFAULT_MAX_RESULTS))
+                targets[target.key] = target
+    return list(targets.values())
+
+
+def load_checked(path=CHECKED_PATH):
+    """Last refresh time per target (Target.checked_key -> datetime) from earlier runs."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {key: _parse_time(value) for key, value in json.load(f).items()}
+
+
+def save_checked(checked, path=CHECKED_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({key: value.strftime(TIME_FORMAT) for key, value in checked.items()}, f, indent=2)
+    os.replace(tmp, path)
+
+
+class RateBudget:
+    """At most `limit` scrapes in any sliding `window` seconds."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._spent = deque()
+
+    def available(self, now):
+        while self._spent and now - self._spent[0] >= self.window:
+            self._spent.popleft()
+        return len(self._spent) < self.limit
+
+    def spend(self, now):
+        self._spent.append(now)
+
+
+class Scheduler:
+    """
+    Keeps watchlist targets fresh within concurrency and rate budgets.
+
+    Every tick, due targets (priority >= 1) are started most overdue first,
+    as long as the global and per-retailer concurrency limits and the
+    retailer's rate budget allow; the rest wait for a later tick.
+    """
+
+    def __init__(self, db, targets, max_concurrent=MAX_CONCURRENT,
+                 retailer_concurrency=None, rate_budgets=None, report=print, checked_path=CHECKED_PATH):
+        self.db = db
+        self.targets = targets
+        self.max_concurrent = max_concurrent
+        self.retailer_concurrency = {**RETAILER_CONCURRENCY, **(retailer_concurrency or {})}
+        self.budgets = {
+            name: RateBudget(*budget) for name, budget in {**RATE_BUDGETS, **(rate_budgets or {})}.items()
+        }
+        self.report = report
+        self.checked_path = checked_path
+        self._checked = load_checked(checked_path)
+
+        self._running = {}   # target key -> asyncio.Task
+        self._per_retailer = {}
+
+    def refresh_stats(self, targets):
+        """Load staleness/volatility of targets from storage (blocking)."""
+        tracked = [t for t in targets if t.product_ids is not None]
+        if tracked:
+            ids = [pid for t in tracked for pid in t.product_ids]
+            by_id = {p["id"]: p for p in self.db.latest(product_ids=ids)}
+            for target in tracked:
+                target.update_stats([by_id[pid] for pid in target.product_ids if pid in by_id])
+
+        for target in targets:
+            if target.product_ids is None:
+                target.update_stats(self.db.search(target.query))
+
+        # A refresh that found only unchanged prices leaves last_updated behind
+        for target in targets:
+            checked = self._checked.get(target.checked_key)
+            if checked and (target.last_updated is None or checked > target.last_updated):
+                target.last_updated = checked
+
+    def _mark_checked(self, target):
+        target.last_updated = datetime.now()
+        self._checked[target.checked_key] = target.last_updated
+        try:
+            save_checked(self._checked, self.checked_path)
+        except OSError as e:
+            self.report(f"⚠️ Could not save refresh times: {e}")
+
+    def due(self, now=None):
+        """Targets due for a refresh, most overdue first."""
+        now = now or datetime.now()
+        ranked = [(t.priority(now), t) for t in self.targets if t.key not in self._running]
+        return [t for score, t in sorted(ranked, key=lambda pair: pair[0], reverse=True) if score >= 1]
+
+    def _can_start(self, retailer, now):
+        if len(self._running) >= self.max_concurrent:
+            return False
+        if self._per_retailer.get(retailer, 0) >= self.retailer_concurrency.get(retailer, 1):
+            return False
+        budget = self.budgets.get(retailer)
+        return budget is None or budget.available(now)
+
+    async def _refresh(self, target):
+        self._per_retailer[target.retailer] = self._per_retailer.get(target.retailer, 0) + 1
+        try:
+            results = await scrape_all_async(
+                target.query, retailers=[target.retailer], report=self.report, max_results=target.max_results
+            )
+            if results[target.retailer]["status"] == "ok":
+                await asyncio.to_thread(self.refresh_stats, [target])
+            # Unchanged products are not rewritten, so last_updated alone can't show this
+            # refresh; failures also wait a full interval instead of retrying every tick
+            self._mark_checked(target)
+        except Exception as e:
+            self.report(f"❌ Refresh of '{target.query}' on {target.retailer} failed: {e}")
+            self._mark_checked(target)
+        finally:
+            self._per_retailer[target.retailer] -= 1
+            self._running.pop(target.key, None)
+
+    def dispatch(self):
+        """Start as many due targets as the budgets allow; returns how many started."""
+        started = 0
+        for target in self.due():
+            if len(self._running) >= self.max_concurrent:
+                break
+            now = time.monotonic()
+            if not self._can_start(target.retailer, now):
+                continue
+            if target.retailer in self.budgets:
+                self.budgets[target.retailer].spend(now)
+            self._running[target.key] = asyncio.create_task(self._refresh(target))
+            started += 1
+        return started
+
+    async def run(self, once=False, tick=TICK_SECONDS):
+        """
+        Refresh due targets forever (or, with `once`, until everything due now is done).
+        Runs on the browser pool's loop.
+        """
+        await asyncio.to_thread(self.refresh_stats, self.targets)
+        self.report(f"📋 Watching {len(self.targets)} targets, {len(self.due())} due now.")
+
+        if once:
+            # Stop when nothing is running and nothing more can start (done, or out of budget)
+            while self.dispatch() or self._running:
+                await asyncio.sleep(1)
+            return
+
+        while True:
+            self.dispatch()
+            await asyncio.sleep(tick)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh watchlist prices on a schedule.")
+    parser.add_argument("--watchlist", default=WATCHLIST_PATH, help="Watchlist JSON file")
+    parser.add_argument("--once", action="store_true", help="Refresh what is due now, then exit")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.watchlist):
+        print(f"Error: {args.watchlist} not found!")
+        return
+
+    # After the dashboard (METRICS_PORT) and its workers
+    metrics.serve_from_env(offset=1 + WORKERS)
+    db = open_database()
+    targets = load_watchlist(args.watchlist, db)
+    print("🚀 Starting price refresh scheduler...")
+    try:
+        get_pool().run(Scheduler(db, targets).run(once=args.once))
+    except KeyboardInterrupt:
+        print("\n🛑 Scheduler stopped.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
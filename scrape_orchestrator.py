@@ -0,0 +1,94 @@
+import asyncio
+import math
+import queue
+import time
+from browser_pool import get_pool
+from crawler import DEFAULT_MAX_RESULTS, MAX_PAGES_LIMIT
+from amazon_playwright import scrape_amazon_async
+from daraz_playwright import scrape_daraz_async
+
+# Retailer name -> async scraper taking (query, max_results=, max_pages=) and returning its saved count.
+# New retailers only need an entry here.
+RETAILERS = {
+    "Amazon": scrape_amazon_async,
+    "Daraz": scrape_daraz_async,
+}
+
+# Per-retailer time budget in seconds for one results page
+DEFAULT_TIMEOUT = 90
+TIMEOUTS = {
+    "Amazon": 90,
+    "Daraz": 90,
+}
+# Deeper crawls get PAGE_SECONDS more per further page (pages assumed to hold RESULTS_PER_PAGE)
+PAGE_SECONDS = 20
+RESULTS_PER_PAGE = 16
+
+
+def time_budget(base, max_results=None, max_pages=None):
+    """Seconds a retailer may take to crawl the requested depth."""
+    pages = max_pages or math.ceil((max_results or DEFAULT_MAX_RESULTS) / RESULTS_PER_PAGE)
+    return base + PAGE_SECONDS * (min(pages, MAX_PAGES_LIMIT) - 1)
+
+
+async def _run_retailer(name, scraper, query, timeout, report, depth):
+    """Run one retailer scraper and turn its outcome into a result dict."""
+    report(f"🔄 Scanning {name}...")
+    start = time.perf_counter()
+    try:
+        saved = await asyncio.wait_for(scraper(query, **depth), timeout=timeout)
+        result = {"status": "ok", "saved": saved or 0}
+        report(f"✅ {name} Done. Saved {result['saved']} products.")
+    except asyncio.TimeoutError:
+        result = {"status": "timeout", "saved": 0}
+        report(f"⏱️ {name} timed out after {timeout}s.")
+    except Exception as e:
+        # CrawlError carries what was stored before the failure
+        result = {"status": "error", "saved": getattr(e, "saved", 0), "error": str(e)}
+        report(f"❌ {name} Error: {e}")
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return name, result
+
+
+async def scrape_all_async(query: str, retailers=None, timeouts=None, report=print, max_results=None, max_pages=None):
+    """
+    Scrape several retailers concurrently on the browser pool's loop and browser.
+    :param retailers: Retailer names to run (defaults to all of RETAILERS)
+    :param timeouts: Optional {retailer: seconds} overriding the budget from TIMEOUTS and the depth
+    :param report: Callable receiving progress messages
+    :param max_results: Unique products per retailer (see crawler.Crawl.run)
+    :param max_pages: Or, result pages per retailer
+    :return: Dict {retailer: {"status", "saved", "seconds", ["error"]}}
+    """
+    names = retailers or list(RETAILERS)
+    budget = {
+        name: time_budget(TIMEOUTS.get(name, DEFAULT_TIMEOUT), max_results, max_pages) for name in names
+    }
+    budget.update(timeouts or {})
+    depth = {"max_results": max_results, "max_pages": max_pages}
+
+    results = await asyncio.gather(*[
+        _run_retailer(name, RETAILERS[name], query, budget[name], report, depth)
+        for name in names
+    ])
+    return dict(results)
+
+
+# 🔁 Sync wrapper (Streamlit-safe)
+def scrape_all(query: str, retailers=None, timeouts=None, report=print, max_results=None, max_pages=None):
+    """
+    Blocking entry point. The scrape runs on the pool's background loop while
+    progress messages are relayed here, so `report` (e.g. st.write) is always
+    called from the caller's thread.
+    """
+    messages = queue.Queue()
+    future = get_pool().submit(
+        scrape_all_async(query, retailers, timeouts, messages.put, max_results, max_pages)
+    )
+
+    while True:
+        try:
+            report(messages.get(timeout=0.2))
+        except queue.Empty:
+            if future.done() and messages.empty():
+                return future.result()
@@ -0,0 +1,252 @@
+"""
+In-memory ranked product search with prefix and typo tolerance.
+
+Titles are tokenized once into an inverted index (token -> {product id: term
+frequency}). Each query token is expanded to indexed tokens it may stand for:
+itself, tokens it is a prefix of ("earb" -> "earbud") and tokens within a small
+edit distance ("samsnug" -> "samsung", candidates found through shared character
+trigrams), each with a weight below 1. Products are ranked by BM25 over the
+expanded tokens.
+
+Besides the BM25 score, every hit carries a `confidence` in [0, 1]: the weighted
+share of query tokens it matched. Unlike BM25 it does not depend on catalog size,
+so it is what callers compare against a threshold to decide whether the index
+has an answer or the query should be scraped.
+
+The index is built from the products collection on first use and kept fresh by
+reading only products whose last_updated moved past the newest one seen, less
+WRITE_WINDOW for writes that committed late. Both
+reads are paged and projected to LIST_FIELDS, so per-product history arrays are
+never loaded.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from metrics import span
+from storage import LIST_FIELDS, rewind
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+PREFIX_WEIGHT = 0.8       # query token is the start of an indexed token
+PREFIX_MIN_LENGTH = 2
+PREFIX_LIMIT = 30         # most expansions per query token, shortest tokens first
+FUZZY_WEIGHTS = {1: 0.8, 2: 0.6}   # edit distance -> weight
+FUZZY_MIN_LENGTH = 4      # shorter tokens: one edit already changes the word
+TWO_EDITS_MIN_LENGTH = 8
+FUZZY_MIN_SHARED = 0.2    # trigram overlap a candidate needs before edit distance is computed
+FUZZY_LIMIT = 10
+
+MIN_CONFIDENCE = 0.75     # share of the query a hit must match to be returned
+TOP_K = 200
+REFRESH_SECONDS = 30      # minimum gap between incremental reloads from storage
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PARTS = re.compile(r"[a-z]+|[0-9]+")
+
+
+def _singular(word):
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and not word[-2].isdigit():
+        return word[:-1]
+    return word
+
+
+def tokenize(text, query=False):
+    """
+    Lowercase alphanumeric tokens with plurals reduced ("earbuds" -> "earbud").
+    Letter/digit runs are split ("iphone15" -> "iphone", "15"): titles index both
+    the joined word and its parts, queries use the parts only so "iphone15"
+    matches "iPhone 15" and "iPhone15" alike.
+    """
+    tokens = []
+    for word in _WORD.findall((text or "").lower()):
+        parts = _PARTS.findall(word)
+        if len(parts) > 1:
+            if not query:
+                tokens.append(_singular(word))
+            tokens.extend(_singular(part) for part in parts)
+        else:
+            tokens.append(_singular(word))
+    return tokens
+
+
+def trigrams(token):
+    padded = f"#{token}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Edits (insert, delete, substitute, swap adjacent) from a to b, or limit + 1 if more."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class SearchEngine:
+    """Thread-safe BM25 index over product titles, holding the latest product documents."""
+
+    def __init__(self, min_confidence=MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.products = {}       # product id -> product document
+        self._lengths = {}       # product id -> title length in tokens
+        self._terms = {}         # product id -> Counter of tokens
+        self._postings = {}      # token -> {product id: term frequency}
+        self._trigrams = {}      # trigram -> set of tokens
+        self._vocabulary = []    # sorted tokens, for prefix lookups
+        self._total_length = 0
+        self.watermark = None    # newest last_updated loaded from storage
+        self._refreshed = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.products)
+
+    # --- Indexing ---
+
+    def _remove(self, pid):
+        for token in self._terms.pop(pid, ()):
+            self._postings[token].pop(pid, None)
+        self._total_length -= self._lengths.pop(pid, 0)
+
+    def add(self, product):
+        """Index (or re-index) one product document; it must have id and title."""
+        pid = product["id"]
+        with self._lock:
+            previous = self.products.get(pid)
+            self.products[pid] = product
+            if previous is not None and previous.get("title") == product.get("title"):
+                return
+            self._remove(pid)
+
+            tokens = tokenize(product.get("title"))
+            counts = Counter(tokens)
+            self._terms[pid] = counts
+            self._lengths[pid] = len(tokens)
+            self._total_length += len(tokens)
+            for token, tf in counts.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocabulary, token)
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                postings[pid] = tf
+
+    def add_many(self, products):
+        for product in products:
+            if product.get("id") and product.get("title"):
+                self.add(product)
+            if product.get("last_updated") and (self.watermark is None or product["last_updated"] > self.watermark):
+                self.watermark = product["last_updated"]
+
+    def refresh(self, db, force=False):
+        """
+        Load products updated since the last refresh (everything on the first call).
+        Skipped within REFRESH_SECONDS of the previous refresh unless `force`.
+        :return: Number of products (re)indexed
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < REFRESH_SECONDS:
+                return 0
+            self._refreshed = time.monotonic()
+            # Writes can commit after their 1-second timestamp; products read again are
+            # replaced by id (and only re-tokenized if their title changed)
+            since = rewind(self.watermark) if self.watermark else None
+        count = 0
+        with span("search_engine.refresh", full=since is None):
+            for page in db.pages(since=since, fields=LIST_FIELDS):
+                self.add_many(page)
+                count += len(page)
+        return count
+
+    # --- Querying ---
+
+    def _expansions(self, token):
+        """[(indexed token, weight)] a query token may stand for."""
+        expansions = {}
+        if token in self._postings and self._postings[token]:
+            expansions[token] = 1.0
+
+        if len(token) >= PREFIX_MIN_LENGTH:
+            prefixed = []
+            for i in range(bisect.bisect_right(self._vocabulary, token), len(self._vocabulary)):
+                candidate = self._vocabulary[i]
+                if not candidate.startswith(token):
+                    break
+                if self._postings[candidate]:
+                    prefixed.append(candidate)
+            for candidate in sorted(prefixed, key=len)[:PREFIX_LIMIT]:
+                expansions.setdefault(candidate, PREFIX_WEIGHT)
+
+        if len(token) >= FUZZY_MIN_LENGTH and token not in expansions:
+            limit = 2 if len(token) >= TWO_EDITS_MIN_LENGTH else 1
+            grams = trigrams(token)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._trigrams.get(gram, ()))
+            similar = []
+            for candidate, n in shared.most_common():
+                if n / len(grams) < FUZZY_MIN_SHARED or len(similar) >= FUZZY_LIMIT:
+                    break
+                distance = edit_distance(token, candidate, limit)
+                if distance <= limit and self._postings[candidate]:
+                    similar.append((candidate, FUZZY_WEIGHTS[distance]))
+            for candidate, weight in similar:
+                if weight > expansions.get(candidate, 0):
+                    expansions[candidate] = weight
+        return list(expansions.items())
+
+    def search(self, query, k=TOP_K):
+        """
+        Top `k` products for `query`, best first.
+        :return: List of (product document, BM25 score, confidence), only hits
+                 with confidence >= min_confidence
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query, query=True)))
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            n = len(self.products)
+            if not n:
+                return []
+            average = self._total_length / n or 1.0
+
+            scores = Counter()
+            matched = Counter()
+            for token in query_tokens:
+                # Each query token counts once per product: its best expansion
+                best = {}
+                for term, weight in self._expansions(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for pid, tf in postings.items():
+                        norm = tf + K1 * (1 - B + B * self._lengths[pid] / average)
+                        score = weight * idf * tf * (K1 + 1) / norm
+                        if score > best.get(pid, (0.0, 0.0))[0]:
+                            best[pid] = (score, weight)
+                for pid, (score, weight) in best.items():
+                    scores[pid] += score
+                    matched[pid] += weight
+
+            hits = []
+            for pid, score in scores.items():
+                confidence = matched[pid] / len(query_tokens)
+                if confidence >= self.min_confidence:
+                    hits.append((confidence, score, pid))
+            return [(self.products[pid], score, confidence) for confidence, score, pid in heapq.nlargest(k, hits)]
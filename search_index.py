@@ -0,0 +1,179 @@
+import os
+import re
+import zlib
+from firebase_admin import firestore
+from metrics import span
+
+INDEX_COLLECTION = "keyword_index"
+SHARD_COLLECTION = "shards"
+INDEX_SHARDS = 16   # posting documents per token
+
+# Firestore caps a batch at 500 writes and get_all requests should stay small
+BATCH_LIMIT = 450
+GET_ALL_CHUNK = 300
+
+_NON_ALNUM = re.compile(r"[^a-z0-9\s]")
+
+
+def normalize_words(text):
+    """
+    Normalize text into comparable keywords:
+    - lowercase
+    - remove special characters
+    - handle singular/plural forms
+    """
+    text = text.lower()
+    text = _NON_ALNUM.sub(" ", text)
+    words = text.split()
+
+    normalized = set()
+    for word in words:
+        normalized.add(word)
+
+        # simple plural handling
+        if word.endswith("s") and len(word) > 3:
+            normalized.add(word[:-1])      # chairs -> chair
+        else:
+            normalized.add(word + "s")     # chair -> chairs
+
+    return normalized
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def shard_of(product_id: str):
+    return zlib.crc32(product_id.encode("utf-8")) % INDEX_SHARDS
+
+
+class KeywordIndex:
+    """
+    Inverted index of normalized title tokens -> product ids, stored in Firestore.
+    Each token's ids are spread over INDEX_SHARDS documents
+    (keyword_index/{token}/shards/{n}, n picked by a hash of the product id), so
+    no posting list grows past Firestore's document size limit and concurrent
+    writers rarely update the same document. A search reads the shards of each
+    query token instead of every product.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.collection(INDEX_COLLECTION)
+
+    def _shard(self, token, n):
+        return self.collection.document(token).collection(SHARD_COLLECTION).document(str(n))
+
+    def add(self, product_id: str, title: str):
+        """Register a single product's title tokens."""
+        self.add_many({product_id: title})
+
+    def add_many(self, titles: dict, previous: dict = None):
+        """
+        Register many products at once.
+        :param titles: Dict {product_id: title}
+        :param previous: Dict {product_id: title indexed before} for retitled products;
+                         tokens only the old title had are removed
+        """
+        added, removed = {}, {}
+        for product_id, title in titles.items():
+            tokens = normalize_words(title or "")
+            stale = normalize_words((previous or {}).get(product_id) or "") - tokens
+            shard = shard_of(product_id)
+            for token in tokens:
+                added.setdefault((token, shard), []).append(product_id)
+            for token in stale:
+                removed.setdefault((token, shard), []).append(product_id)
+
+        writes = [(key, {"ids": firestore.ArrayUnion(ids)}) for key, ids in added.items()]
+        writes += [(key, {"ids": firestore.ArrayRemove(ids)}) for key, ids in removed.items()]
+        for chunk in chunked(writes, BATCH_LIMIT):
+            batch = self.db.batch()
+            for (token, shard), update in chunk:
+                batch.set(self._shard(token, shard), update, merge=True)
+            with span("firestore.commit", collection=INDEX_COLLECTION):
+                batch.commit()
+
+    def remove(self, product_id: str, title: str):
+        """Drop a product's title tokens."""
+        self.add_many({product_id: ""}, previous={product_id: title})
+
+    def lookup(self, query: str):
+        """
+        Return the set of product ids whose title contains ALL query keywords
+        (singular/plural safe), by intersecting the tokens' posting lists.
+        """
+        tokens = normalize_words(query)
+        if not tokens:
+            return set()
+
+        postings = {token: set() for token in tokens}
+        refs = [self._shard(token, n) for token in tokens for n in range(INDEX_SHARDS)]
+        for chunk in chunked(refs, GET_ALL_CHUNK):
+            with span("firestore.get_all", collection=INDEX_COLLECTION):
+                snaps = list(self.db.get_all(chunk))
+            for snap in snaps:
+                if snap.exists:
+                    postings[snap.reference.parent.parent.id].update(snap.to_dict().get("ids", []))
+
+        # Intersect starting from the shortest list to keep the working set small
+        ordered = sorted(postings.values(), key=len)
+        result = set(ordered[0])
+        for ids in ordered[1:]:
+            result.intersection_update(ids)
+            if not result:
+                break
+        return result
+
+    def rebuild(self, products_collection):
+        """
+        Index every existing product from scratch, replacing what is stored:
+        needed once for products inserted before the index (or this layout)
+        existed, and clears tokens of titles changed outside insert_many.
+        """
+        titles = {}
+        for doc in products_collection.select(["title"]).stream():
+            titles[doc.id] = (doc.to_dict() or {}).get("title", "")
+
+        postings = {}
+        for product_id, title in titles.items():
+            for token in normalize_words(title or ""):
+                postings.setdefault((token, shard_of(product_id)), []).append(product_id)
+
+        # Shards no longer backed by any title, and token docs of the old one-document layout
+        stale = []
+        for token_ref in self.collection.list_documents():
+            stale.append(token_ref)
+            stale.extend(
+                shard for shard in token_ref.collection(SHARD_COLLECTION).list_documents()
+                if (token_ref.id, int(shard.id)) not in postings
+            )
+
+        for chunk in chunked(postings.items(), BATCH_LIMIT):
+            batch = self.db.batch()
+            for (token, shard), ids in chunk:
+                batch.set(self._shard(token, shard), {"ids": ids})
+            with span("firestore.commit", collection=INDEX_COLLECTION):
+                batch.commit()
+        for chunk in chunked(stale, BATCH_LIMIT):
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            with span("firestore.commit", collection=INDEX_COLLECTION):
+                batch.commit()
+        return len(titles)
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    CRED_PATH = os.path.join(BASE_DIR, "serviceAccountKey.json")
+
+    db = Database(CRED_PATH)
+    print("🔄 Rebuilding keyword index...")
+    total = db.index.rebuild(db.collection)
+    print(f"✅ Indexed {total} products.")
@@ -0,0 +1,195 @@
+"""
+Local columnar copy of the catalog for the dashboard's reads.
+
+Products (LIST_FIELDS) and the flattened price history are kept as Arrow IPC
+files under SNAPSHOT_DIR and memory-mapped on load, so the tables are shared
+with the page cache instead of being parsed into Python objects. The database
+stays the source of truth: `sync` reads only products and history points newer
+than the watermark (the newest last_updated held) and appends them, history as
+an extra part file; parts are compacted into one beyond MAX_HISTORY_PARTS.
+
+    python snapshot.py    # build or update the snapshot from the configured storage
+"""
+import json
+import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+from storage import BASE_DIR, CRED_PATH, LIST_FIELDS, PAGE_SIZE, WRITE_WINDOW, open_database, rewind
+from metrics import span
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshot"))
+SYNC_SECONDS = 30        # minimum gap between syncs unless forced
+SYNC_OVERLAP = WRITE_WINDOW   # seconds re-read before the watermark: commits can land after their timestamp
+MAX_HISTORY_PARTS = 20
+
+PRODUCTS_FILE = "products.arrow"
+META_FILE = "meta.json"
+
+_TYPES = {
+    "price_value": pa.float64(), "rating_value": pa.float64(),
+    "price_min": pa.float64(), "price_max": pa.float64(), "price_count": pa.int64(),
+}
+PRODUCT_SCHEMA = pa.schema([("id", pa.string())] + [(f, _TYPES.get(f, pa.string())) for f in LIST_FIELDS])
+HISTORY_SCHEMA = pa.schema([
+    ("product_id", pa.string()), ("price", pa.string()), ("price_value", pa.float64()), ("timestamp", pa.string()),
+])
+
+
+def read_arrow(path):
+    """Memory-mapped, zero-copy table from an Arrow IPC file."""
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_arrow(path, tables, schema):
+    """Write record batches to `path` atomically (readers keep their mapping of the old file)."""
+    tmp = f"{path}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for table in tables:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """
+    Memory-mapped `products` (LIST_FIELDS) and `points` (product_id, price,
+    price_value, timestamp) tables, synced incrementally from a storage backend.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._synced = 0.0
+        self.meta = {"watermark": None, "history_parts": [], "next_part": 1}
+        meta_path = self._path(META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta.update(json.load(f))
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        path = self._path(PRODUCTS_FILE)
+        self.products = read_arrow(path) if os.path.exists(path) else PRODUCT_SCHEMA.empty_table()
+        parts = [read_arrow(self._path(name)) for name in self.meta["history_parts"]]
+        self.points = pa.concat_tables(parts) if parts else HISTORY_SCHEMA.empty_table()
+
+    def _save_meta(self):
+        tmp = self._path(f"{META_FILE}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, self._path(META_FILE))
+
+    @property
+    def watermark(self):
+        return self.meta["watermark"]
+
+    # --- Sync ---
+
+    def _merge_products(self, changed):
+        """Replace changed rows (and add new ones), keeping the table newest first."""
+        fresh = pa.Table.from_pylist(changed, schema=PRODUCT_SCHEMA)
+        kept = self.products.filter(pc.invert(pc.is_in(self.products["id"], value_set=fresh["id"])))
+        merged = pa.concat_tables([fresh, kept]).sort_by([("last_updated", "descending"), ("id", "descending")])
+        write_arrow(self._path(PRODUCTS_FILE), [merged], PRODUCT_SCHEMA)
+
+    def _append_history(self, db, since):
+        """Write points newer than `since` to a new part file; returns how many were new."""
+        seen = set()
+        if since:
+            # Points inside the overlap window may already be held
+            recent = self.points.filter(pc.greater(self.points["timestamp"], since))
+            seen = set(zip(recent["product_id"].to_pylist(), recent["timestamp"].to_pylist()))
+
+        name = f"history-{self.meta['next_part']:05d}.arrow"
+        path = self._path(name)
+        added = 0
+        with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, HISTORY_SCHEMA) as writer:
+            for page in db.history_pages(since=since):
+                page = [p for p in page if (p["product_id"], p["timestamp"]) not in seen]
+                if page:
+                    writer.write_table(pa.Table.from_pylist(page, schema=HISTORY_SCHEMA))
+                    added += len(page)
+        if not added:
+            os.remove(f"{path}.tmp")
+            return 0
+
+        os.replace(f"{path}.tmp", path)
+        self.meta["history_parts"].append(name)
+        self.meta["next_part"] += 1
+        return added
+
+    def _compact_history(self):
+        """Rewrite all history parts as one file."""
+        old_parts = self.meta["history_parts"]
+        name = f"history-{self.meta['next_part']:05d}.arrow"
+        write_arrow(self._path(name), [read_arrow(self._path(part)) for part in old_parts], HISTORY_SCHEMA)
+        self.meta["history_parts"] = [name]
+        self.meta["next_part"] += 1
+        self._save_meta()
+        for part in old_parts:
+            os.remove(self._path(part))
+
+    def sync(self, db, force=False):
+        """
+        Pull products and history points written since the watermark (everything on
+        the first call). Skipped within SYNC_SECONDS of the previous sync unless `force`.
+        :return: Number of products read (0 when skipped or nothing changed)
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._synced < SYNC_SECONDS:
+                return 0
+            self._synced = time.monotonic()
+
+            since = rewind(self.watermark, SYNC_OVERLAP) if self.watermark else None
+            with span("snapshot.sync", full=since is None):
+                changed = [product for page in db.pages(since=since, fields=LIST_FIELDS) for product in page]
+                if changed:
+                    self._merge_products(changed)
+                points = self._append_history(db, since)
+
+                newest = max((p["last_updated"] for p in changed if p.get("last_updated")), default=None)
+                if newest and (self.watermark is None or newest > self.watermark):
+                    self.meta["watermark"] = newest
+                self._save_meta()
+                if len(self.meta["history_parts"]) > MAX_HISTORY_PARTS:
+                    self._compact_history()
+                if changed or points:
+                    self._load()
+            return len(changed)
+
+    # --- Reads (same shapes as the storage backends) ---
+
+    def pages(self, since=None, fields=None, page_size=PAGE_SIZE):
+        """Products with last_updated > since, newest first, in lists of `page_size` dicts."""
+        table = self.products
+        if since:
+            table = table.filter(pc.greater(table["last_updated"], since))
+        if fields:
+            table = table.select(list(dict.fromkeys(["id", *fields, "last_updated"])))
+        for start in range(0, table.num_rows, page_size):
+            yield table.slice(start, page_size).to_pylist()
+
+    def history(self, product_id, start=None, end=None, after=None):
+        """Price history of one product, oldest first."""
+        mask = pc.equal(self.points["product_id"], product_id)
+        if after:
+            mask = pc.and_(mask, pc.greater(self.points["timestamp"], after))
+        if start:
+            mask = pc.and_(mask, pc.greater_equal(self.points["timestamp"], start))
+        if end:
+            mask = pc.and_(mask, pc.less_equal(self.points["timestamp"], end))
+        points = self.points.filter(mask).select(["price", "price_value", "timestamp"])
+        return points.sort_by("timestamp").to_pylist()
+
+
+if __name__ == "__main__":
+    snapshot = Snapshot()
+    count = snapshot.sync(open_database(CRED_PATH), force=True)
+    print(f"📦 Synced {count} products; snapshot holds {snapshot.products.num_rows} products and "
+          f"{snapshot.points.num_rows} history points (watermark {snapshot.watermark}).")
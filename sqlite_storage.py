@@ -0,0 +1,337 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from search_index import normalize_words, chunked
+from storage import (
+    Storage, product_id, numeric_fields, price_aggregates, aggregates_from_history, plan_write,
+    AGGREGATE_FIELDS, PAGE_SIZE, SKIP, RECORD,
+)
+from normalization import parse_price
+from metrics import timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    price TEXT,
+    rating TEXT,
+    retailer TEXT,
+    url TEXT,
+    price_value REAL,
+    currency TEXT,
+    rating_value REAL,
+    price_min REAL,
+    price_max REAL,
+    price_count INTEGER,
+    price_mean REAL,
+    recent_prices TEXT,
+    first_seen TEXT,
+    last_change TEXT,
+    timestamp TEXT,
+    last_updated TEXT,
+    last_recorded TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_retailer ON products(retailer);
+-- Serves paged reads ordered by (last_updated, id); replaces the last_updated-only index
+DROP INDEX IF EXISTS idx_products_last_updated;
+CREATE INDEX IF NOT EXISTS idx_products_updated_id ON products(last_updated, id);
+
+CREATE TABLE IF NOT EXISTS history (
+    product_id TEXT NOT NULL,
+    price TEXT,
+    price_value REAL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_product_ts ON history(product_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_ts ON history(timestamp);
+
+CREATE TABLE IF NOT EXISTS title_tokens (
+    token TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    PRIMARY KEY (token, product_id)
+) WITHOUT ROWID;
+"""
+
+# Columns added after the first schema version: (table, column, type)
+ADDED_COLUMNS = [
+    ("products", "price_value", "REAL"),
+    ("products", "currency", "TEXT"),
+    ("products", "rating_value", "REAL"),
+    ("history", "price_value", "REAL"),
+    ("products", "price_min", "REAL"),
+    ("products", "price_max", "REAL"),
+    ("products", "price_count", "INTEGER"),
+    ("products", "price_mean", "REAL"),
+    ("products", "recent_prices", "TEXT"),
+    ("products", "first_seen", "TEXT"),
+    ("products", "last_change", "TEXT"),
+    ("products", "last_recorded", "TEXT"),
+]
+
+# Columns written on every upsert, in insert order
+WRITE_COLUMNS = [
+    "id", "title", "price", "rating", "retailer", "url",
+    "price_value", "currency", "rating_value", *AGGREGATE_FIELDS,
+    "timestamp", "last_updated", "last_recorded",
+]
+
+# SQLite allows 999 bound parameters per statement on older builds
+PARAM_CHUNK = 900
+
+
+class SQLiteDatabase(Storage):
+    """
+    Embedded SQLite storage backend.
+    Same data model as Firestore: products keyed by product_id, a history table,
+    and a title_tokens table that plays the role of the keyword index.
+    """
+
+    def __init__(self, path: str):
+        """Open (and create if needed) the SQLite database file."""
+        self.path = path
+        # Shared between the Streamlit thread and the browser pool thread; writers in
+        # other processes (scrape workers, scheduler) wait up to `timeout` for the write lock
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            self._add_missing_columns()
+
+    def _add_missing_columns(self):
+        """Bring database files created by older versions up to the current schema."""
+        for table, column, kind in ADDED_COLUMNS:
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def _rows(self, sql, params=()):
+        with self.lock:
+            return [self._to_dict(row) for row in self.conn.execute(sql, params)]
+
+    @staticmethod
+    def _to_dict(row):
+        data = dict(row)
+        if data.get("recent_prices"):
+            data["recent_prices"] = json.loads(data["recent_prices"])
+        return data
+
+    def _history_locked(self, product_id):
+        return [
+            dict(row) for row in self.conn.execute(
+                "SELECT price, price_value, timestamp FROM history WHERE product_id = ? ORDER BY timestamp",
+                (product_id,)
+            )
+        ]
+
+    @timed("storage.insert_many", backend="sqlite")
+    def insert_many(self, rows):
+        """Upsert changed products and append history points (see plan_write) in one transaction."""
+        # Last row wins if a scrape returns the same product twice
+        products = {}
+        for title, price, rating, retailer, url in rows:
+            products[product_id(retailer, url, title)] = (title, price, rating, retailer, url)
+        if not products:
+            return 0
+
+        with self.lock, self.conn:
+            # Take the write lock before reading: aggregates are read-modify-write, and other
+            # processes must not write between the SELECT and the upsert
+            self.conn.execute("BEGIN IMMEDIATE")
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            existing = {}
+            for chunk in chunked(products, PARAM_CHUNK):
+                marks = ",".join("?" * len(chunk))
+                for row in self.conn.execute(f"SELECT * FROM products WHERE id IN ({marks})", chunk):
+                    data = self._to_dict(row)
+                    if data.get("price_count") is None:
+                        # Written before aggregates existed: rebuild them from history once
+                        data.update(aggregates_from_history(self._history_locked(data["id"])) or {})
+                    existing[data["id"]] = data
+
+            records = []
+            recorded = []
+            for doc_id, (title, price, rating, retailer, url) in products.items():
+                previous = existing.get(doc_id)
+                numbers = numeric_fields(price, rating)
+                action = plan_write(previous, price, rating, retailer, url, numbers["price_value"], current_time)
+                if action == SKIP:
+                    continue
+
+                record = {
+                    "id": doc_id, "title": title, "price": price, "rating": rating,
+                    "retailer": retailer, "url": url,
+                    **numbers,
+                    "timestamp": previous["timestamp"] if previous else current_time,
+                    "last_updated": current_time,
+                }
+                if action == RECORD:
+                    record.update(price_aggregates(previous, record["price_value"], current_time))
+                    record["last_recorded"] = current_time
+                    recorded.append(record)
+                else:
+                    # Rating or link changed only: keep the history aggregates as they are
+                    record.update({field: previous.get(field) for field in (*AGGREGATE_FIELDS, "last_recorded")})
+                record["recent_prices"] = json.dumps(record["recent_prices"])
+                records.append(record)
+
+            updates = ",\n".join(f"{col} = excluded.{col}" for col in WRITE_COLUMNS if col not in ("id", "timestamp"))
+            self.conn.executemany(
+                f"""
+                INSERT INTO products ({", ".join(WRITE_COLUMNS)})
+                VALUES ({", ".join("?" * len(WRITE_COLUMNS))})
+                ON CONFLICT(id) DO UPDATE SET {updates}
+                """,
+                [tuple(record[col] for col in WRITE_COLUMNS) for record in records]
+            )
+            self.conn.executemany(
+                "INSERT INTO history (product_id, price, price_value, timestamp) VALUES (?, ?, ?, ?)",
+                [(r["id"], r["price"], r["price_value"], current_time) for r in recorded]
+            )
+            # New products, and written ones whose title changed: drop tokens of the old title
+            retitled = {r["id"] for r in records if r["id"] in existing and r["title"] != existing[r["id"]].get("title")}
+            self.conn.executemany("DELETE FROM title_tokens WHERE product_id = ?", [(pid,) for pid in retitled])
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO title_tokens (token, product_id) VALUES (?, ?)",
+                [
+                    (token, r["id"])
+                    for r in records if r["id"] not in existing or r["id"] in retitled
+                    for token in normalize_words(r["title"])
+                ]
+            )
+
+        inserted = len(products) - len(existing)
+        updated = len(records) - inserted
+        print(f"Inserted {inserted} new, updated {updated} and skipped {len(products) - len(records)} unchanged products.")
+        return len(products)
+
+    @timed("storage.search", backend="sqlite")
+    def search(self, query: str):
+        """Products whose title tokens include every query token."""
+        tokens = sorted(normalize_words(query))
+        if not tokens:
+            return []
+        marks = ",".join("?" * len(tokens))
+        return self._rows(
+            f"""
+            SELECT * FROM products WHERE id IN (
+                SELECT product_id FROM title_tokens
+                WHERE token IN ({marks})
+                GROUP BY product_id
+                HAVING COUNT(*) = ?
+            )
+            """,
+            (*tokens, len(tokens))
+        )
+
+    @timed("storage.latest", backend="sqlite")
+    def latest(self, product_ids=None, retailer=None, limit=None, since=None, fields=None, start_after=None):
+        """Current state of products, most recently updated first (ties by id, descending)."""
+        columns = ", ".join(dict.fromkeys(["id", *fields, "last_updated"])) if fields else "*"
+        filters = []
+        params = []
+        if retailer:
+            filters.append("retailer = ?")
+            params.append(retailer)
+        if since:
+            filters.append("last_updated > ?")
+            params.append(since)
+        if start_after:
+            filters.append("(last_updated < ? OR (last_updated = ? AND id < ?))")
+            params += [start_after["last_updated"], start_after["last_updated"], start_after["id"]]
+
+        if product_ids is not None:
+            results = []
+            for chunk in chunked(product_ids, PARAM_CHUNK):
+                sql = f"SELECT {columns} FROM products WHERE id IN ({','.join('?' * len(chunk))})"
+                sql += "".join(f" AND {f}" for f in filters)
+                results.extend(self._rows(sql, [*chunk, *params]))
+            results.sort(key=lambda r: (r.get("last_updated") or "", r["id"]), reverse=True)
+            return results[:limit] if limit else results
+
+        sql = f"SELECT {columns} FROM products"
+        if filters:
+            sql += " WHERE " + " AND ".join(filters)
+        sql += " ORDER BY last_updated DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._rows(sql, params)
+
+    @timed("storage.history", backend="sqlite")
+    def history(self, product_id: str, start=None, end=None, after=None):
+        """Price history of one product, oldest first."""
+        sql = "SELECT price, price_value, timestamp FROM history WHERE product_id = ?"
+        params = [product_id]
+        if after:
+            sql += " AND timestamp > ?"
+            params.append(after)
+        if start:
+            sql += " AND timestamp >= ?"
+            params.append(start)
+        if end:
+            sql += " AND timestamp <= ?"
+            params.append(end)
+        return self._rows(sql + " ORDER BY timestamp", params)
+
+    def history_pages(self, since=None, page_size=PAGE_SIZE):
+        """History points of all products, oldest first (ties in insertion order)."""
+        cursor = None  # (timestamp, rowid) of the last row read
+        while True:
+            filters = []
+            params = []
+            if since:
+                filters.append("timestamp > ?")
+                params.append(since)
+            if cursor:
+                filters.append("(timestamp > ? OR (timestamp = ? AND rowid > ?))")
+                params += [cursor[0], *cursor]
+            sql = "SELECT rowid, product_id, price, price_value, timestamp FROM history"
+            if filters:
+                sql += " WHERE " + " AND ".join(filters)
+            rows = self._rows(sql + " ORDER BY timestamp, rowid LIMIT ?", [*params, page_size])
+            if rows:
+                cursor = (rows[-1]["timestamp"], rows[-1]["rowid"])
+                yield [{k: v for k, v in row.items() if k != "rowid"} for row in rows]
+            if len(rows) < page_size:
+                return
+
+    def backfill_numeric_fields(self):
+        """Fill parsed numeric columns on rows written before they existed."""
+        with self.lock, self.conn:
+            products = self.conn.execute(
+                "SELECT id, price, rating FROM products WHERE price_value IS NULL"
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE products SET price_value = ?, currency = ?, rating_value = ? WHERE id = ?",
+                [
+                    (numbers["price_value"], numbers["currency"], numbers["rating_value"], row[0])
+                    for row in products
+                    for numbers in [numeric_fields(row[1], row[2])]
+                ]
+            )
+            points = self.conn.execute(
+                "SELECT rowid, price FROM history WHERE price_value IS NULL"
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE history SET price_value = ? WHERE rowid = ?",
+                [(parse_price(row[1]), row[0]) for row in points]
+            )
+
+            missing = [row[0] for row in self.conn.execute("SELECT id FROM products WHERE price_count IS NULL")]
+            for doc_id in missing:
+                aggregates = aggregates_from_history(self._history_locked(doc_id))
+                if not aggregates:
+                    continue
+                aggregates["recent_prices"] = json.dumps(aggregates["recent_prices"])
+                self.conn.execute(
+                    f"UPDATE products SET {', '.join(f'{col} = ?' for col in AGGREGATE_FIELDS)} WHERE id = ?",
+                    (*[aggregates[col] for col in AGGREGATE_FIELDS], doc_id)
+                )
+        return len(set(row[0] for row in products) | set(missing)), len(points)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
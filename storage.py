@@ -0,0 +1,306 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, unquote
+from normalization import parse_price, parse_rating, detect_currency
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CRED_PATH = os.path.join(BASE_DIR, "serviceAccountKey.json")
+SQLITE_PATH = os.path.join(BASE_DIR, "price_tracker.db")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Longest a write may take from stamping last_updated/timestamp to committing. Readers that
+# resume from a watermark re-read this far back (deduping), or they miss late commits.
+WRITE_WINDOW = 120
+
+# An unchanged product still gets a history point once this long after its last one
+HEARTBEAT_SECONDS = float(os.environ.get("PRICE_HEARTBEAT_HOURS", "24")) * 3600
+
+# Product fields the dashboard lists and charts; projected reads skip the rest (e.g. recent_prices)
+LIST_FIELDS = (
+    "title", "price", "rating", "retailer", "url", "price_value", "currency", "rating_value",
+    "price_min", "price_max", "price_count", "timestamp", "last_updated",
+)
+PAGE_SIZE = 500
+
+_AMAZON_ASIN = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})")
+
+
+def canonical_url(url):
+    """
+    Reduce a product URL to a stable form: no query string, fragment or tracking path.
+    Amazon links (including sponsored redirects) collapse to /dp/<ASIN>.
+    """
+    if not url:
+        return None
+    match = _AMAZON_ASIN.search(unquote(url))
+    if match and "amazon." in url:
+        return f"https://www.amazon.com/dp/{match.group(1)}"
+
+    parts = urlsplit(url if "//" in url else f"https://{url}")
+    if not parts.netloc:
+        return None
+    return f"https://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def product_id(retailer, url, title):
+    """Deterministic product id: hash of retailer plus canonical URL (or title)."""
+    key = canonical_url(url) or " ".join((title or "").lower().split())
+    return hashlib.sha1(f"{(retailer or '').lower()}|{key}".encode("utf-8")).hexdigest()[:20]
+
+
+def numeric_fields(price, rating):
+    """Parsed numbers stored next to the raw scraped strings."""
+    return {
+        "price_value": parse_price(price),
+        "currency": detect_currency(price),
+        "rating_value": parse_rating(rating) if rating else None,
+    }
+
+
+# Price points kept on the product doc for the rolling mean
+ROLLING_WINDOW = 10
+
+AGGREGATE_FIELDS = ["price_min", "price_max", "price_count", "first_seen", "last_change", "price_mean", "recent_prices"]
+
+
+def price_aggregates(previous, price_value, current_time):
+    """
+    Running history aggregates after one more price point, so metrics can be
+    shown from the product doc alone.
+    :param previous: Product dict holding the previous aggregates (or None for a new product)
+    :param price_value: Parsed price of the new point (0/None when unparseable)
+    :param current_time: Timestamp of the new point
+    """
+    previous = previous or {}
+    recent = list(previous.get("recent_prices") or [])
+    aggregates = {
+        "price_count": (previous.get("price_count") or 0) + 1,
+        "first_seen": previous.get("first_seen") or previous.get("timestamp") or current_time,
+        "last_change": previous.get("last_change") or current_time,
+    }
+
+    # Unparseable prices count as data points but don't move min/max/mean
+    if price_value:
+        if recent and recent[-1] != price_value:
+            aggregates["last_change"] = current_time
+        recent = (recent + [price_value])[-ROLLING_WINDOW:]
+        aggregates["price_min"] = min(previous.get("price_min") or price_value, price_value)
+        aggregates["price_max"] = max(previous.get("price_max") or price_value, price_value)
+    else:
+        aggregates["price_min"] = previous.get("price_min")
+        aggregates["price_max"] = previous.get("price_max")
+
+    aggregates["recent_prices"] = recent
+    aggregates["price_mean"] = round(sum(recent) / len(recent), 2) if recent else None
+    return aggregates
+
+
+def aggregates_from_history(points):
+    """Aggregates for a product rebuilt from its full history (oldest first)."""
+    aggregates = None
+    for point in points:
+        price_value = point.get("price_value")
+        if price_value is None:
+            price_value = parse_price(point.get("price"))
+        aggregates = price_aggregates(aggregates, price_value, point["timestamp"])
+    return aggregates
+
+
+# Fields the change check needs from a stored product
+STATE_FIELDS = ["price", "rating", "retailer", "url", "price_value", "last_updated", "last_recorded"]
+
+# What insert_many must write for one scraped product (see plan_write)
+SKIP, UPDATE, RECORD = "skip", "update", "record"
+
+
+def _age_seconds(since, current_time):
+    try:
+        return (datetime.strptime(current_time, TIME_FORMAT) - datetime.strptime(since, TIME_FORMAT)).total_seconds()
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def rewind(timestamp, seconds=WRITE_WINDOW):
+    """`timestamp` (TIME_FORMAT) moved back by `seconds`: where a reader resuming from it starts."""
+    return (datetime.strptime(timestamp, TIME_FORMAT) - timedelta(seconds=seconds)).strftime(TIME_FORMAT)
+
+
+def plan_write(previous, price, rating, retailer, url, price_value, current_time, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Decide what an upsert of one scraped product has to write.
+    :param previous: Stored product (at least STATE_FIELDS), or None if new
+    :return: RECORD (product, aggregates and a history point) for new products,
+             price changes and heartbeats; UPDATE (product fields only) when just
+             the rating or link changed; SKIP when nothing changed
+    """
+    if previous is None:
+        return RECORD
+    if price_value and previous.get("price_value"):
+        price_changed = price_value != previous["price_value"]
+    else:
+        price_changed = price != previous.get("price")
+    last_recorded = previous.get("last_recorded") or previous.get("last_updated")
+    if price_changed or _age_seconds(last_recorded, current_time) >= heartbeat:
+        return RECORD
+    if (rating, retailer, url) != (previous.get("rating"), previous.get("retailer"), previous.get("url")):
+        return UPDATE
+    return SKIP
+
+
+# Last-known product states kept per process
+STATE_CACHE_SIZE = 50_000
+STATE_TTL = 15 * 60   # seconds before a cached state is re-read (other processes may have written)
+
+
+class StateCache:
+    """LRU of product id -> last-known stored state, so repeat scrapes only re-read what confirms it."""
+
+    def __init__(self, max_size=STATE_CACHE_SIZE, ttl=STATE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids):
+        """Fresh cached states for the ids that have one."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for doc_id in ids:
+                cached = self._states.get(doc_id)
+                if cached is not None and now - cached[1] < self.ttl:
+                    found[doc_id] = cached[0]
+                    self._states.move_to_end(doc_id)
+        return found
+
+    def put(self, doc_id, state, refreshed=True):
+        """
+        Remember a product's state.
+        :param refreshed: False keeps the previous cache time, e.g. when nothing was
+                          written and the state was not re-read from storage
+        """
+        with self._lock:
+            cached = self._states.get(doc_id)
+            cached_at = time.monotonic() if refreshed or cached is None else cached[1]
+            self._states[doc_id] = (state, cached_at)
+            self._states.move_to_end(doc_id)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+
+
+class Storage(ABC):
+    """
+    Interface every storage backend implements.
+    Product dicts carry: id, title, price, rating, retailer, url, timestamp, last_updated
+    and the parsed price_value, currency, rating_value (see numeric_fields), plus
+    history aggregates price_min/max/count/mean, first_seen, last_change (see price_aggregates)
+    and last_recorded, the time of the newest history point.
+    History dicts carry: price, price_value, timestamp. A point is only added when
+    the price changes or HEARTBEAT_SECONDS have passed (see plan_write).
+    """
+
+    def insert(self, data: tuple):
+        """
+        Insert or update a single product record.
+        :param data: Tuple (title, price, rating, retailer, url)
+        """
+        return self.insert_many([data])
+
+    @abstractmethod
+    def insert_many(self, rows):
+        """
+        Upsert many products, writing only what changed (see plan_write).
+        :param rows: Iterable of tuples (title, price, rating, retailer, url)
+        :return: Number of products stored (new, updated or confirmed unchanged)
+        """
+
+    @abstractmethod
+    def search(self, query: str):
+        """Products whose title contains all query keywords (singular/plural safe)."""
+
+    @abstractmethod
+    def latest(self, product_ids=None, retailer=None, limit=None, since=None, fields=None, start_after=None):
+        """
+        Current state of products, most recently updated first (ties by id, descending).
+        :param product_ids: Restrict to these ids
+        :param retailer: Restrict to one retailer
+        :param limit: Maximum number of products
+        :param since: Only products with last_updated > since (incremental reads)
+        :param fields: Only return these fields (plus id and last_updated), e.g. LIST_FIELDS
+        :param start_after: Product dict (id, last_updated) of the previous page's last row
+        """
+
+    def pages(self, retailer=None, since=None, fields=None, page_size=PAGE_SIZE):
+        """Yield `latest` in lists of at most `page_size`, each read resuming after the previous page."""
+        cursor = None
+        while True:
+            page = self.latest(retailer=retailer, limit=page_size, since=since, fields=fields, start_after=cursor)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
+
+    @abstractmethod
+    def history(self, product_id: str, start=None, end=None, after=None):
+        """
+        Price history of one product, oldest first.
+        :param start: Only points with timestamp >= start ("YYYY-mm-dd HH:MM:SS")
+        :param end: Only points with timestamp <= end
+        :param after: Only points with timestamp > after (incremental reads)
+        """
+
+    @abstractmethod
+    def history_pages(self, since=None, page_size=PAGE_SIZE):
+        """
+        Yield the history points of every product, oldest first, in lists of at most
+        `page_size` dicts carrying product_id, price, price_value and timestamp.
+        :param since: Only points with timestamp > since (incremental reads)
+        """
+
+    @abstractmethod
+    def backfill_numeric_fields(self):
+        """
+        One-off migration: add price_value/currency/rating_value and history
+        aggregates to products, and price_value to history points, for data
+        stored before these fields were written at ingest time.
+        :return: Tuple (products updated, history points updated)
+        """
+
+    def rekey_products(self):
+        """
+        One-off migration: move products stored under ids other than
+        product_id(retailer, url, title), with their history, to that id, merging
+        with a product already stored there. Backends that always used
+        deterministic ids have nothing to move.
+        :return: Tuple (products moved, of which merged into an existing product)
+        """
+        return 0, 0
+
+    def close(self):
+        pass
+
+
+def open_database(cred_path: str = CRED_PATH):
+    """
+    Open the storage backend selected by the STORAGE_BACKEND environment variable:
+    "firestore" (default) or "sqlite" (local file at SQLITE_PATH, overridable via env).
+    """
+    backend = os.environ.get("STORAGE_BACKEND", "firestore").lower()
+
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteDatabase
+        return SQLiteDatabase(os.environ.get("SQLITE_PATH", SQLITE_PATH))
+
+    if backend == "firestore":
+        from database import Database
+        return Database(cred_path)
+
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'firestore' or 'sqlite').")
@@ -0,0 +1,100 @@
+"""Test doubles shared by the test modules."""
+
+
+class FakeStorage:
+    """Minimal read side of a storage backend for Snapshot.sync."""
+
+    def __init__(self, products, points):
+        self.products = products
+        self.points = points
+
+    def pages(self, since=None, fields=None, page_size=500):
+        rows = [p for p in self.products if since is None or p["last_updated"] > since]
+        if rows:
+            yield rows
+
+    def history_pages(self, since=None, page_size=500):
+        rows = [p for p in self.points if since is None or p["timestamp"] > since]
+        if rows:
+            yield rows
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and field_paths is not None:
+            data = {f: data[f] for f in field_paths if f in data}
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return FakeCollection(self.store, self.path + (name,))
+
+    def get(self):
+        return FakeSnapshot(self, self.store.docs.get(self.path))
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.store.next_id += 1
+            doc_id = f"auto{self.store.next_id}"
+        return FakeDocument(self.store, self.path + (doc_id,))
+
+    def stream(self):
+        for path in sorted(p for p in self.store.docs if p[:-1] == self.path):
+            yield FakeSnapshot(FakeDocument(self.store, path), self.store.docs[path])
+
+
+class FakeWrites:
+    """Batch and transaction: writes are applied on commit."""
+
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref.path, data, merge))
+
+    def update(self, ref, fields):
+        self.ops.append((ref.path, fields, True))
+
+    def commit(self):
+        for path, data, merge in self.ops:
+            self.store.docs[path] = {**self.store.docs.get(path, {}), **data} if merge else dict(data)
+        self.ops = []
+
+
+class FakeFirestore:
+    """In-memory stand-in for the parts of the Firestore client insert_many uses."""
+
+    def __init__(self):
+        self.docs = {}      # path tuple -> fields
+        self.next_id = 0
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def batch(self):
+        return FakeWrites(self)
+
+    def transaction(self):
+        return FakeWrites(self)
+
+    def get_all(self, refs, field_paths=None, transaction=None):
+        return [FakeSnapshot(ref, self.docs.get(ref.path), field_paths) for ref in refs]
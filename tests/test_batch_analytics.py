@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+from batch_analytics import biggest_drops, build_summary, product_stats
+from snapshot import Snapshot
+from fakes import FakeStorage
+
+NOW = pd.Timestamp("2026-10-17 12:00:00")
+
+
+def frame(rows):
+    df = pd.DataFrame(rows, columns=["product_id", "price_value", "timestamp"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+def test_price_drop_and_time_weighted_average():
+    stats = product_stats(frame([
+        ("a", 100, "2026-09-01 12:00:00"),
+        ("a", 80, "2026-10-14 12:00:00"),
+    ]), NOW).loc["a"]
+
+    assert stats["current_price"] == 80
+    assert stats["drop_1d"] == 0
+    assert stats["drop_7d"] == pytest.approx(20)
+    # 100 held for 4 of the last 7 days, 80 for 3
+    assert stats["avg_7d"] == pytest.approx((100 * 4 + 80 * 3) / 7)
+    assert stats["days_since_lowest"] == 0
+    assert stats["vs_min_pct"] == 0
+
+
+def test_unparseable_price_is_not_a_drop_or_new_low():
+    stats = product_stats(frame([
+        ("c", 5000, "2026-10-01 12:00:00"),
+        ("c", 0.0, "2026-10-15 12:00:00"),    # "Out of stock"
+        ("c", None, "2026-10-16 12:00:00"),
+    ]), NOW).loc["c"]
+
+    assert stats["current_price"] == 5000
+    assert stats["price_min"] == 5000
+    assert stats["drop_7d"] == 0
+    assert stats["vs_min_pct"] == 0
+
+
+def test_rise_after_low_point():
+    stats = product_stats(frame([
+        ("b", 50, "2026-10-01 12:00:00"),
+        ("b", 40, "2026-10-05 12:00:00"),
+        ("b", 60, "2026-10-16 12:00:00"),
+    ]), NOW).loc["b"]
+
+    assert stats["price_min"] == 40
+    assert stats["vs_min_pct"] == pytest.approx(50)
+    assert stats["drop_7d"] == pytest.approx(-50)
+    # 40 held until the rise a day ago
+    assert stats["days_since_lowest"] == pytest.approx(1)
+
+
+def test_chunks_cover_every_product(tmp_path):
+    points = [
+        {"product_id": f"p{i}", "price": None, "price_value": 100.0 - j, "timestamp": f"2026-10-1{j} 00:00:00"}
+        for i in range(7) for j in range(3)
+    ]
+    snapshot = Snapshot(str(tmp_path))
+    snapshot.sync(FakeStorage([], points), force=True)
+
+    summary = build_summary(snapshot, now=NOW, chunk_size=3)
+    assert sorted(summary["product_id"]) == [f"p{i}" for i in range(7)]
+    assert (summary["current_price"] == 98).all()
+
+
+def test_empty_snapshot_gives_empty_leaderboard(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    summary = build_summary(snapshot, now=NOW)
+
+    assert summary.empty
+    assert biggest_drops(summary, snapshot).empty
+    assert biggest_drops(None, snapshot).empty
+
+
+def test_leaderboard_joins_listing_details(tmp_path):
+    products = [
+        {"id": "a", "title": "Phone", "retailer": "Daraz", "url": "https://x/a", "price": "Rs. 80",
+         "last_updated": "2026-10-14 12:00:00"},
+        {"id": "b", "title": "Lamp", "retailer": "Amazon", "url": "https://x/b", "price": "Rs. 100",
+         "last_updated": "2026-10-01 12:00:00"},
+    ]
+    points = [
+        {"product_id": "a", "price": "Rs. 100", "price_value": 100.0, "timestamp": "2026-09-01 12:00:00"},
+        {"product_id": "a", "price": "Rs. 80", "price_value": 80.0, "timestamp": "2026-10-14 12:00:00"},
+        {"product_id": "b", "price": "Rs. 100", "price_value": 100.0, "timestamp": "2026-10-01 12:00:00"},
+    ]
+    snapshot = Snapshot(str(tmp_path))
+    snapshot.sync(FakeStorage(products, points), force=True)
+
+    leaders = biggest_drops(build_summary(snapshot, now=NOW), snapshot, days=7)
+    assert leaders["title"].tolist() == ["Phone"]
+    assert leaders["drop_7d"].iloc[0] == pytest.approx(20)
@@ -0,0 +1,23 @@
+from daraz_playwright import daraz_row
+from extraction import DARAZ_SPEC, extract_html
+
+DARAZ_PAGE = """
+<div data-qa-locator="product-item">
+  <a href="//www.daraz.pk/products/earbuds-i1.html"><img alt="Wireless Earbuds"></a>
+  <span>Rs. 2,499</span>
+</div>
+<div data-qa-locator="product-item">
+  <a href="//www.daraz.pk/products/ad-i2.html"></a>
+  <span>Rs. 999</span>
+</div>
+"""
+
+
+def test_daraz_cards_without_a_title_are_not_stored():
+    rows = [daraz_row(item) for item in extract_html(DARAZ_PAGE, DARAZ_SPEC)]
+    assert rows == [("Wireless Earbuds", "Rs. 2,499", None, "Daraz", "https://www.daraz.pk/products/earbuds-i1.html"), None]
+
+
+def test_placeholder_title_is_rejected():
+    item = {"title": "No Title", "price": "Rs. 999", "href": "//www.daraz.pk/products/x.html"}
+    assert daraz_row(item) is None
@@ -0,0 +1,54 @@
+import database
+from database import Database
+from storage import StateCache
+from fakes import FakeFirestore
+
+URL = "https://www.daraz.pk/products/x-i1.html"
+
+
+class NoIndex:
+    def add_many(self, titles, previous=None):
+        pass
+
+
+def process(store):
+    """A Database client as a separate worker process would have it: own state cache."""
+    db = Database.__new__(Database)
+    db.db = store
+    db.collection = store.collection("products")
+    db.index = NoIndex()
+    db.state = StateCache()
+    return db
+
+
+def history(store, db):
+    doc_id = next(iter(db.state._states))
+    points = [data for path, data in store.docs.items() if path[:2] == ("products", doc_id) and len(path) == 4]
+    return [p["price"] for p in sorted(points, key=lambda p: p["timestamp"])]
+
+
+def test_price_written_by_another_process_is_not_skipped(monkeypatch):
+    def transactional(write):
+        def run(transaction):
+            result = write(transaction)
+            transaction.commit()
+            return result
+        return run
+    monkeypatch.setattr(database.firestore, "transactional", transactional)
+
+    store = FakeFirestore()
+    worker, scheduler = process(store), process(store)
+    worker.insert_many([("Phone", "Rs. 100", "4.5", "Daraz", URL)])
+    scheduler.insert_many([("Phone", "Rs. 120", "4.5", "Daraz", URL)])
+
+    # The worker's cache still says 100: the return to 100 must be written and recorded
+    worker.insert_many([("Phone", "Rs. 100", "4.5", "Daraz", URL)])
+
+    product = next(data for path, data in store.docs.items() if len(path) == 2)
+    assert product["price"] == "Rs. 100"
+    assert product["price_count"] == 3
+    assert history(store, worker) == ["Rs. 100", "Rs. 120", "Rs. 100"]
+
+    # Unchanged since its own write: skipped without writing
+    worker.insert_many([("Phone", "Rs. 100", "4.5", "Daraz", URL)])
+    assert history(store, worker) == ["Rs. 100", "Rs. 120", "Rs. 100"]
@@ -0,0 +1,49 @@
+import threading
+from history_cache import HistoryCache
+
+
+class FakeHistory:
+    def __init__(self, points):
+        self.points = points
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = None
+
+    def history(self, product_id, start=None, end=None, after=None):
+        self.calls += 1
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        return [p for p in self.points if start is None or p["timestamp"] >= start]
+
+
+def point(price, timestamp):
+    return {"price": str(price), "price_value": float(price), "timestamp": timestamp}
+
+
+def test_refresh_keeps_points_in_the_last_seen_second():
+    db = FakeHistory([point(100, "2026-10-17 10:00:00")])
+    cache = HistoryCache(db)
+    assert len(cache.get("a")) == 1
+
+    # Same second as the cached point, and an older point that committed late
+    db.points += [point(90, "2026-10-17 10:00:00"), point(95, "2026-10-17 09:59:30")]
+    db.points.sort(key=lambda p: p["timestamp"])
+    cache.expire()
+
+    assert [p["price_value"] for p in cache.get("a")] == [95, 100, 90]
+
+
+def test_invalidate_during_fetch_is_not_undone():
+    db = FakeHistory([point(100, "2026-10-17 10:00:00")])
+    db.release = threading.Event()
+    cache = HistoryCache(db)
+
+    future = cache._submit("a")
+    db.started.wait(5)
+    cache.invalidate("a")
+    db.release.set()
+    assert len(future.result()) == 1
+
+    cache.get("a")
+    assert db.calls == 2
@@ -0,0 +1,33 @@
+from job_queue import JobQueue
+
+
+def test_same_query_joins_the_active_job(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.db"))
+    first = jobs.submit("Chairs", max_results=20)
+    assert jobs.submit("chair", max_results=20) == first
+
+
+def test_deeper_request_raises_a_queued_job(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.db"))
+    first = jobs.submit("chair", max_results=20)
+    assert jobs.submit("chair", max_results=200) == first
+    assert jobs.get(first)["max_results"] == 200
+    # A shallower request does not lower it again
+    jobs.submit("chair", max_results=5)
+    assert jobs.get(first)["max_results"] == 200
+
+
+def test_deeper_request_queues_a_follow_up_behind_a_running_job(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.db"))
+    first = jobs.submit("chair", max_results=20)
+    assert jobs.claim(worker=1)["id"] == first
+
+    follow_up = jobs.submit("chair", max_results=200)
+    assert follow_up != first
+    assert jobs.submit("chair", max_results=20) == follow_up
+    # Not claimed while the shallower scrape of the same query runs
+    assert jobs.claim(worker=2) is None
+
+    jobs.finish(first, {"Daraz": {"status": "ok", "saved": 20}})
+    job = jobs.claim(worker=2)
+    assert (job["id"], job["max_results"]) == (follow_up, 200)
@@ -0,0 +1,41 @@
+import matching
+from matching import ProductMatcher
+
+
+def test_same_product_across_retailers_is_clustered():
+    matcher = ProductMatcher()
+    first = matcher.add("daraz-1", "Apple iPhone 15 128GB Black Smartphone")
+    assert matcher.add("amazon-1", "Apple iPhone 15 128GB - Black Smartphone (PTA Approved)") == first
+    assert matcher.add("amazon-2", "Samsung Galaxy Buds2 Pro Wireless Earbuds") != first
+
+
+def test_conflicting_storage_sizes_are_not_matched():
+    matcher = ProductMatcher()
+    first = matcher.add("a", "Apple iPhone 15 128GB Black Smartphone")
+    assert matcher.add("b", "Apple iPhone 15 256GB Black Smartphone") != first
+
+
+def test_conflict_is_checked_against_the_whole_cluster():
+    matcher = ProductMatcher()
+    first = matcher.add("a", "Apple iPhone 15 128GB Black Smartphone")
+    # No size: compatible with the 128GB listing, so it joins its cluster
+    assert matcher.add("b", "Apple iPhone 15 Black Smartphone") == first
+    # Compatible with "b" alone, but the cluster already holds a 128GB listing
+    assert matcher.add("c", "Apple iPhone 15 256GB Black Smartphone") != first
+    assert matcher.cluster_ids(["a", "b"]) == [first, first]
+
+
+def test_extra_numbers_still_match():
+    matcher = ProductMatcher()
+    first = matcher.add("a", "Apple iPhone 15 128GB Black Smartphone")
+    assert matcher.add("b", "Apple iPhone 15 128GB 6.1 inch Black Smartphone") == first
+
+
+def test_title_of_common_tokens_still_finds_candidates(monkeypatch):
+    monkeypatch.setattr(matching, "MAX_BLOCK_SIZE", 2)
+    matcher = ProductMatcher()
+    first = matcher.add("a", "Apple iPhone 15 128GB Black Smartphone")
+    matcher.add("b", "Apple iPhone 15 256GB Black Smartphone")
+    matcher.add("c", "Apple iPhone 15 512GB Black Smartphone")
+    # Every shared token but "128gb" is now in more listings than the cap
+    assert matcher.add("d", "Apple iPhone 15 128GB Black Smartphone (PTA Approved)") == first
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from rate_limiter import Blocked, RetailerLimiter, TokenBucket, backoff_delay
+
+
+def make_limiter(**overrides):
+    options = {"rate": 1000.0, "burst": 10, "min_concurrency": 1, "max_concurrency": 4, "slow_after": 10.0}
+    options.update(overrides)
+    return RetailerLimiter("Test", **options)
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=5.0) <= 5.0
+
+
+def test_token_bucket_spaces_requests():
+    async def run():
+        bucket = TokenBucket(rate=20.0, burst=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        return loop.time() - start
+
+    # First token is free, the next two take 1/20 s each
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_success_raises_limit_and_error_halves_it():
+    async def run():
+        limiter = make_limiter()
+        for _ in range(6):
+            async with limiter.slot():
+                pass
+        raised = limiter.limit
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+        return raised, limiter.limit
+
+    raised, after_error = asyncio.run(run())
+    assert raised > 1
+    assert after_error == pytest.approx(max(1, raised / 2))
+
+
+def test_block_pauses_bucket():
+    async def run():
+        limiter = make_limiter()
+        with pytest.raises(Blocked):
+            async with limiter.slot():
+                raise Blocked("captcha")
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.bucket.tokens == 0
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_token_wait_releases_slot():
+    async def run():
+        limiter = make_limiter(rate=0.01, burst=1)
+        async with limiter.slot():      # uses the only token
+            pass
+
+        async def wait_for_slot():
+            async with limiter.slot():
+                pass
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(wait_for_slot(), timeout=0.05)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_call_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr("rate_limiter.backoff_delay", lambda attempt: 0)
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Blocked("captcha")
+        return "ok"
+
+    async def run():
+        limiter = make_limiter()
+        limiter.bucket.pause = lambda seconds: None
+        return await limiter.call(fetch, attempts=3)
+
+    assert asyncio.run(run()) == "ok"
+    assert len(attempts) == 3
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+from scheduler import Scheduler, Target
+
+
+class FakeStorage:
+    def __init__(self, products):
+        self.products = products
+
+    def search(self, query):
+        return self.products
+
+    def latest(self, product_ids=None, **kwargs):
+        return [p for p in self.products if p["id"] in product_ids]
+
+
+def test_refresh_time_survives_a_restart(tmp_path):
+    path = str(tmp_path / "checked.json")
+    stale = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d %H:%M:%S")
+    db = FakeStorage([{"id": "a", "retailer": "Daraz", "last_updated": stale, "recent_prices": [100, 100]}])
+
+    target = Target("iphone 15", "Daraz", interval=60)
+    scheduler = Scheduler(db, [target], checked_path=path)
+    scheduler.refresh_stats([target])
+    assert scheduler.due() == [target]
+
+    # A refresh that only confirmed unchanged prices writes nothing to storage
+    scheduler._mark_checked(target)
+
+    restarted = Target("iphone 15", "Daraz", interval=60)
+    scheduler = Scheduler(db, [restarted], checked_path=path)
+    scheduler.refresh_stats([restarted])
+    assert scheduler.due() == []
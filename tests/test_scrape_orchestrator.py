@@ -0,0 +1,34 @@
+import asyncio
+import scrape_orchestrator
+from crawler import CrawlError
+from scrape_orchestrator import scrape_all_async, time_budget
+
+
+async def crashes(query, max_results=None, max_pages=None):
+    raise CrawlError("page 3 failed", saved=12)
+
+
+async def hangs(query, max_results=None, max_pages=None):
+    await asyncio.sleep(10)
+
+
+async def works(query, max_results=None, max_pages=None):
+    return 5
+
+
+def test_failures_and_timeouts_are_reported(monkeypatch):
+    monkeypatch.setattr(scrape_orchestrator, "RETAILERS", {"A": crashes, "B": hangs, "C": works})
+    messages = []
+    results = asyncio.run(scrape_all_async("phone", timeouts={"B": 0.05}, report=messages.append))
+
+    assert results["A"]["status"] == "error"
+    assert results["A"]["saved"] == 12
+    assert results["B"]["status"] == "timeout"
+    assert (results["C"]["status"], results["C"]["saved"]) == ("ok", 5)
+    assert not any("A Done" in m for m in messages)
+
+
+def test_time_budget_grows_with_depth():
+    assert time_budget(90) == 90
+    assert time_budget(90, max_results=200) > time_budget(90, max_results=20) > 90
+    assert time_budget(90, max_pages=1000) == time_budget(90, max_pages=20)
@@ -0,0 +1,64 @@
+from search_engine import SearchEngine, edit_distance, tokenize
+from fakes import FakeStorage
+
+
+def product(pid, title, last_updated="2026-10-17 10:00:00"):
+    return {"id": pid, "title": title, "price": "Rs. 1,000", "last_updated": last_updated}
+
+
+def engine_with(*titles):
+    engine = SearchEngine()
+    engine.add_many(product(str(i), title) for i, title in enumerate(titles))
+    return engine
+
+
+def titles(hits):
+    return [p["title"] for p, _, _ in hits]
+
+
+def test_tokenize_splits_model_numbers_and_plurals():
+    assert tokenize("Wireless Earbuds iPhone15") == ["wireless", "earbud", "iphone15", "iphone", "15"]
+    assert tokenize("iphone15", query=True) == ["iphone", "15"]
+
+
+def test_edit_distance_counts_swaps_as_one_edit():
+    assert edit_distance("samsnug", "samsung", 2) == 1
+    assert edit_distance("samsung", "apple", 2) == 3
+
+
+def test_ranking_prefers_full_matches():
+    engine = engine_with("Samsung Galaxy S24 Phone", "Samsung Phone Case", "Apple iPhone 15")
+    assert titles(engine.search("samsung galaxy"))[0] == "Samsung Galaxy S24 Phone"
+    assert "Apple iPhone 15" not in titles(engine.search("samsung galaxy"))
+
+
+def test_prefix_and_typo_matches():
+    engine = engine_with("Wireless Earbuds", "Samsung Galaxy S24")
+    assert titles(engine.search("earb")) == ["Wireless Earbuds"]
+    assert titles(engine.search("samsnug")) == ["Samsung Galaxy S24"]
+
+
+def test_low_confidence_hits_are_dropped():
+    engine = engine_with("Samsung Galaxy S24")
+    assert engine.search("samsung blender mixer") == []
+
+
+def test_refresh_picks_up_writes_in_the_watermark_second():
+    db = FakeStorage([product("a", "Wireless Earbuds", "2026-10-17 10:00:00")], [])
+    engine = SearchEngine()
+    engine.refresh(db, force=True)
+
+    # Same second as the watermark, and an older write that committed late
+    db.products += [product("b", "Wireless Mouse", "2026-10-17 10:00:00"),
+                    product("c", "Wireless Keyboard", "2026-10-17 09:59:30")]
+    engine.refresh(db, force=True)
+
+    assert sorted(titles(engine.search("wireless"))) == ["Wireless Earbuds", "Wireless Keyboard", "Wireless Mouse"]
+    assert len(engine) == 3
+
+
+def test_retitled_product_is_reindexed():
+    engine = engine_with("Wireless Earbuds")
+    engine.add(product("0", "Bluetooth Speaker", "2026-10-17 11:00:00"))
+    assert engine.search("earbuds") == []
+    assert titles(engine.search("speaker")) == ["Bluetooth Speaker"]
@@ -0,0 +1,63 @@
+import snapshot as snapshot_module
+from snapshot import Snapshot
+from fakes import FakeStorage
+
+
+def product(pid, price, last_updated):
+    return {"id": pid, "title": f"Product {pid}", "price": str(price), "price_value": float(price),
+            "retailer": "Daraz", "last_updated": last_updated}
+
+
+def point(pid, price, timestamp):
+    return {"product_id": pid, "price": str(price), "price_value": float(price), "timestamp": timestamp}
+
+
+def test_incremental_sync_replaces_changed_products(tmp_path):
+    db = FakeStorage(
+        [product("a", 100, "2026-10-17 10:00:00"), product("b", 50, "2026-10-17 10:00:05")],
+        [point("a", 100, "2026-10-17 10:00:00"), point("b", 50, "2026-10-17 10:00:05")],
+    )
+    snapshot = Snapshot(str(tmp_path))
+    assert snapshot.sync(db, force=True) == 2
+    assert snapshot.watermark == "2026-10-17 10:00:05"
+
+    db.products[0] = product("a", 90, "2026-10-17 10:30:00")
+    db.points.append(point("a", 90, "2026-10-17 10:30:00"))
+    snapshot.sync(db, force=True)
+
+    rows = {p["id"]: p for page in snapshot.pages() for p in page}
+    assert rows["a"]["price_value"] == 90
+    assert len(rows) == 2
+    assert [p["price_value"] for p in snapshot.history("a")] == [100, 90]
+    # Points re-read from the overlap window are not held twice
+    assert snapshot.points.num_rows == 3
+
+
+def test_late_commit_inside_write_window_is_picked_up(tmp_path):
+    db = FakeStorage([product("a", 100, "2026-10-17 10:00:00")], [point("a", 100, "2026-10-17 10:00:00")])
+    snapshot = Snapshot(str(tmp_path))
+    snapshot.sync(db, force=True)
+
+    # Stamped a minute before the watermark, committed after the previous sync
+    db.products.append(product("b", 70, "2026-10-17 09:59:00"))
+    db.points.append(point("b", 70, "2026-10-17 09:59:00"))
+    snapshot.sync(db, force=True)
+
+    assert [p["price_value"] for p in snapshot.history("b")] == [70]
+    assert {p["id"] for page in snapshot.pages() for p in page} == {"a", "b"}
+
+
+def test_snapshot_reloads_from_disk_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_module, "MAX_HISTORY_PARTS", 2)
+    db = FakeStorage([], [])
+    snapshot = Snapshot(str(tmp_path))
+    for minute in range(4):
+        ts = f"2026-10-17 10:{minute * 10:02d}:00"
+        db.products[:] = [product("a", 100 - minute, ts)]
+        db.points.append(point("a", 100 - minute, ts))
+        snapshot.sync(db, force=True)
+
+    assert len(snapshot.meta["history_parts"]) <= 2
+    reopened = Snapshot(str(tmp_path))
+    assert [p["price_value"] for p in reopened.history("a")] == [100, 99, 98, 97]
+    assert reopened.watermark == "2026-10-17 10:30:00"
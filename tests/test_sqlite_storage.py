@@ -0,0 +1,56 @@
+import threading
+from storage import open_database, price_aggregates
+
+
+def test_price_aggregates_track_min_max_and_changes():
+    first = price_aggregates(None, 100.0, "2026-10-01 10:00:00")
+    second = price_aggregates(first, 80.0, "2026-10-02 10:00:00")
+    third = price_aggregates(second, None, "2026-10-03 10:00:00")
+
+    assert (second["price_min"], second["price_max"], second["price_count"]) == (80.0, 100.0, 2)
+    assert second["price_mean"] == 90.0
+    assert second["first_seen"] == "2026-10-01 10:00:00"
+    assert second["last_change"] == "2026-10-02 10:00:00"
+    # Unparseable prices count as points but leave min/max/mean alone
+    assert (third["price_min"], third["price_max"], third["price_count"]) == (80.0, 100.0, 3)
+    assert third["recent_prices"] == [100.0, 80.0]
+
+
+def test_concurrent_writers_keep_aggregates_consistent(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "prices.db"))
+    url = "https://www.daraz.pk/products/x"
+    open_database().insert_many([("Phone", "Rs. 1000", "4.5", "Daraz", url)])
+
+    # Separate connections stand in for the worker processes and the scheduler
+    writers = [open_database() for _ in range(4)]
+    barrier = threading.Barrier(len(writers))
+
+    def scrape(db, n):
+        barrier.wait()
+        for i in range(10):
+            db.insert_many([("Phone", f"Rs. {1001 + n * 10 + i}", "4.5", "Daraz", url)])
+
+    threads = [threading.Thread(target=scrape, args=(db, n)) for n, db in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = open_database()
+    product = db.latest()[0]
+    assert product["price_count"] == len(db.history(product["id"])) == 41
+    assert product["price_min"] == 1000.0
+    assert product["price_max"] == 1040.0
+
+
+def test_retitled_product_is_searchable_by_new_title_only(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "prices.db"))
+    url = "https://www.daraz.pk/products/x"
+    db = open_database()
+    db.insert_many([("Wireless Earbuds Black", "Rs. 1000", "4.5", "Daraz", url)])
+    db.insert_many([("Bluetooth Earbuds Black", "Rs. 900", "4.5", "Daraz", url)])
+
+    assert [p["title"] for p in db.search("bluetooth earbuds")] == ["Bluetooth Earbuds Black"]
+    assert db.search("wireless") == []
@@ -0,0 +1,50 @@
+from storage import RECORD, SKIP, UPDATE, StateCache, plan_write
+
+NOW = "2026-10-17 12:00:00"
+
+
+def stored(**fields):
+    return {"price": "Rs. 1,000", "price_value": 1000.0, "rating": "4.5", "retailer": "Daraz",
+            "url": "https://www.daraz.pk/products/x", "last_updated": "2026-10-17 11:00:00",
+            "last_recorded": "2026-10-17 11:00:00", **fields}
+
+
+def plan(previous, price="Rs. 1,000", price_value=1000.0, rating="4.5", url="https://www.daraz.pk/products/x"):
+    return plan_write(previous, price, rating, "Daraz", url, price_value, NOW, heartbeat=24 * 3600)
+
+
+def test_new_product_is_recorded():
+    assert plan(None) == RECORD
+
+
+def test_unchanged_product_is_skipped():
+    assert plan(stored()) == SKIP
+
+
+def test_price_change_is_recorded():
+    assert plan(stored(), price="Rs. 900", price_value=900.0) == RECORD
+
+
+def test_reformatted_price_with_same_value_is_not_a_change():
+    assert plan(stored(), price="PKR 1000") == SKIP
+
+
+def test_rating_or_link_change_updates_without_history():
+    assert plan(stored(), rating="4.7") == UPDATE
+    assert plan(stored(), url="https://www.daraz.pk/products/y") == UPDATE
+
+
+def test_heartbeat_records_a_steady_price():
+    assert plan(stored(last_recorded="2026-10-16 11:00:00")) == RECORD
+
+
+def test_state_cache_expires_and_evicts():
+    cache = StateCache(max_size=2, ttl=60)
+    cache.put("a", {"price": "1"})
+    cache.put("b", {"price": "2"})
+    cache.put("c", {"price": "3"})
+    assert set(cache.get_many(["a", "b", "c"])) == {"b", "c"}
+
+    expired = StateCache(ttl=0)
+    expired.put("a", {"price": "1"})
+    assert expired.get_many(["a"]) == {}